@@ -1,61 +1,82 @@
 import json
 import time
 import argparse
-import random
-from dataclasses import dataclass
-from typing import Optional
+import functools
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
+from typing import Iterator, NamedTuple, Optional
 
 from state import WorldState, Budget, TraceEvent, StepContext
-from trace_logger import TraceLogger
+from trace_logger import TraceLogger, timestamp_ms
 from oracle_checker import check_success
+from runner import BudgetTracker
 import mock_api
 from constants import SEED
 from learning import FaultSignature, MemoryBank
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson 直接解析 bytes；没有安装时退回 json.loads（同样接受 bytes）
+_loads = orjson.loads if orjson is not None else json.loads
+_READ_BUFFER_SIZE = 1 << 20  # 1 MiB 读缓冲，大文件逐行读取时减少 read 系统调用
+
+
+_VALID_MODES = frozenset({"B0", "B1", "B2", "B3", "B4"})
+_DIAGNOSIS_MODES = frozenset({"B3", "B4"})
+_BACKOFF_MODES = frozenset({"B2", "B3", "B4"})
+_TRANSIENT_ERRORS = frozenset({"Timeout", "HTTP_500"})
+_ESCALATE_ERRORS = frozenset({"PolicyRejected", "AuthDenied"})
+_SEMANTIC_ERRORS = frozenset({"PolicyRejected", "AuthDenied", "BadRequest"})
+_GUARDED_ACTIONS = frozenset({"retry", "rollback"})
+_LABELED_SOURCES = frozenset({"memory", "diagnosis"})
+
+
+@functools.lru_cache(maxsize=256)
+def _cached_default_payload(error_type: str, action: str, source: str, note: str) -> dict:
+    """规则类决策的默认 payload；取值空间很小，按参数缓存复用同一个 dict（只读）"""
+    default_layer = (
+        "semantic"
+        if error_type in _SEMANTIC_ERRORS
+        else "persistent"
+    )
+    return {
+        "layer_pred": default_layer,
+        "action_pred": action,
+        "confidence": 0.5,
+        "rationale_short": note,
+        "source": source,
+    }
+
 
-@dataclass
-class RecoveryDecision:
+class RecoveryDecision(NamedTuple):
     action: str
     payload: dict
     source: str  # rule | diagnosis | memory
 
 
-class BudgetTracker:
-    def __init__(self, budget: Budget):
-        self.budget = budget
-        self.budget.start_time = time.perf_counter()
-    
-    def estimate_tokens(self, data: dict) -> int:
-        return len(json.dumps(data)) // 4
-    
-    def check_budget(self) -> dict:
-        elapsed = time.perf_counter() - self.budget.start_time
-        return {
-            "tokens": self.budget.max_tokens - self.budget.used_tokens,
-            "tool_calls": self.budget.max_tool_calls - self.budget.used_tool_calls,
-            "time": self.budget.max_time_s - elapsed
-        }
-
-    def snapshot(self) -> dict:
-        elapsed = time.perf_counter() - self.budget.start_time
-        remaining = self.check_budget()
-        used = {
-            "tokens": self.budget.used_tokens,
-            "tool_calls": self.budget.used_tool_calls,
-            "time": elapsed
-        }
-        return {"remaining": remaining, "used": used}
-    
-    def is_exhausted(self) -> bool:
-        remaining = self.check_budget()
-        return any(v <= 0 for v in remaining.values())
-    
-    def consume(self, tokens: int = 0, tool_calls: int = 0):
-        self.budget.used_tokens += tokens
-        self.budget.used_tool_calls += tool_calls
-
-
 class BaselineRunner:
+    # Built once; _execute_step dispatches with a single dict lookup.
+    _TOOL_MAP = {
+        "get_record": mock_api.get_record,
+        "auth_check": mock_api.auth_check,
+        "policy_check": mock_api.policy_check,
+        "update_record": mock_api.update_record,
+        "send_message": mock_api.send_message,
+        "notify_user": mock_api.notify_user,
+        "create_ticket": mock_api.create_ticket,
+        "commit": mock_api.commit,
+        "rollback": mock_api.rollback,
+        "lock_inventory": mock_api.lock_inventory,
+        "unlock_inventory": mock_api.unlock_inventory,
+        "process_payment": mock_api.process_payment,
+        "refund_payment": mock_api.refund_payment,
+        "write_audit": mock_api.write_audit,
+    }
+
     def __init__(
         self,
         mode: str,
@@ -63,6 +84,8 @@ class BaselineRunner:
         diagnosis_mode: str = "mock",
         memory_path: Optional[str] = None,
         memory_threshold: float = 0.8,
+        simulate_latency: bool = True,
+        memory_autosave: bool = True,
     ):
         """
         Args:
@@ -70,19 +93,24 @@ class BaselineRunner:
             seed: Random seed for reproducibility
             diagnosis_mode: "mock" | "llm" (for B3/B4)
             memory_path: optional path to memory bank JSON (for B4)
+            simulate_latency: sleep for simulated tool/fault latency, retry backoff and LLM latency
+                (False skips every wait; overrides mock_api.SIMULATE_LATENCY for this runner's tasks)
+            memory_autosave: False defers memory bank writes to memory_bank.flush() (for B4)
         """
-        if mode not in ["B0", "B1", "B2", "B3", "B4"]:
+        if mode not in _VALID_MODES:
             raise ValueError(f"Invalid mode: {mode}")
 
         self.mode = mode
+        # 构造时按模式绑定恢复决策，热路径上不再逐次判断 mode
+        self._get_recovery_action = getattr(self, f"_decide_{mode.lower()}")
         self.logger = TraceLogger()
         self.seed = seed
-        random.seed(seed)
         self.llm_calls = 0
         self.memory_threshold = memory_threshold
+        self.simulate_latency = simulate_latency
 
         # B3/B4: Initialize diagnosis agent
-        if mode in ["B3", "B4"]:
+        if mode in _DIAGNOSIS_MODES:
             from diagnosis import DiagnosisAgent
             self.diagnosis_agent = DiagnosisAgent(mode=diagnosis_mode)
         else:
@@ -91,19 +119,19 @@ class BaselineRunner:
         # B4: Initialize memory bank
         self.memory_bank = None
         if mode == "B4":
-            self.memory_bank = MemoryBank(memory_path)
+            self.memory_bank = MemoryBank(memory_path, autosave=memory_autosave)
     
     def run_task(self, task: dict) -> dict:
+        """执行单个任务；mock_api 的模拟延迟按本实例的 simulate_latency 开关"""
+        with mock_api.simulated_latency(self.simulate_latency):
+            return self._run_task(task)
+
+    def _run_task(self, task: dict) -> dict:
         """执行单个任务"""
         task_id = task["task_id"]
         
         # 初始化状态
-        initial_state = task["initial_world_state"]
-        world_state = WorldState(
-            records=json.loads(json.dumps(initial_state["records"])),
-            inventory=json.loads(json.dumps(initial_state["inventory"])),
-            audit_log=json.loads(json.dumps(initial_state["audit_log"]))
-        )
+        world_state = WorldState.from_initial(task["initial_world_state"])
         
         # 初始化预算
         budget = Budget(
@@ -114,59 +142,75 @@ class BaselineRunner:
         tracker = BudgetTracker(budget)
         
         steps = task["steps"]
-        fault_injections = task.get("fault_injections", [])
+        # 每个 step 只看第一条匹配的故障配置（与原线性扫描 + break 语义一致）
+        fault_by_step = {}
+        for fi in task.get("fault_injections", []):
+            fault_by_step.setdefault(fi["step_idx"], fi)
         
-        checkpoint = world_state.deep_copy()
+        # 惰性 checkpoint：None 表示“自上次成功以来状态未变”，真正回滚时才物化快照。
+        # 前提：mock_api 工具失败时不改状态（fail-atomic），故障注入也不改状态。
+        checkpoint: Optional[WorldState] = None
         retry_counts = {}
         first_failure_signature: Optional[FaultSignature] = None
         first_failure_action: Optional[str] = None
         
+        # 热循环内反复用到的属性/长度先绑定为局部变量
+        n_steps = len(steps)
+        append_event = self.logger.append
+
+        # is_exhausted 内联到循环头：预算上限在任务内不变，先绑定为局部变量
+        max_tokens, max_tool_calls = budget.max_tokens, budget.max_tool_calls
+        start_time, max_time_s = budget.start_time, budget.max_time_s
+
         step_idx = 0
-        while step_idx < len(steps):
-            if tracker.is_exhausted():
+        while step_idx < n_steps:
+            if (
+                budget.used_tokens >= max_tokens
+                or budget.used_tool_calls >= max_tool_calls
+                or time.perf_counter() - start_time >= max_time_s
+            ):
                 self._escalate_human(task_id, step_idx, "budget_exhausted", world_state, tracker)
                 self._append_final_event(task_id, step_idx, tracker, "escalated", "budget_exhausted")
                 return {"task_id": task_id, "status": "escalated", "reason": "budget_exhausted"}
             
             step = steps[step_idx]
+            step_name = step["step_name"]
             tool_name = step["tool_name"]
             params = step["params"]
             attempt_idx = retry_counts.get(step_idx, 0)
-            state_hash_pre = world_state.compute_hash()
             
             # 查找故障注入
             fault_injection = None
-            for fi in fault_injections:
-                if fi["step_idx"] == step_idx:
-                    injected = mock_api.FaultInjector.should_inject(
-                        fi, step_idx, task_id, world_state, attempt_idx
-                    )
-                    if injected:
-                        fault_injection = injected
-                    break
+            fi = fault_by_step.get(step_idx)
+            if fi is not None:
+                fault_injection = mock_api.FaultInjector.should_inject(
+                    fi, step_idx, task_id, world_state, attempt_idx
+                )
 
             # 执行工具
             result = self._execute_step(world_state, tool_name, params, fault_injection)
             
-            # 记录轨迹
+            # 记录轨迹（每个事件只采样一次时钟）
             state_hash = world_state.compute_hash()
-            budget_snapshot = tracker.snapshot()
+            now = time.perf_counter()
+            budget_snapshot = tracker.snapshot(now)
+            remaining, used = budget_snapshot["remaining"], budget_snapshot["used"]
             
             # 准备 StepContext (for B3)
             step_context = StepContext(
                 task_id=task_id,
                 step_idx=step_idx,
-                step_name=step["step_name"],
+                step_name=step_name,
                 tool_name=tool_name,
                 params=params,
                 state_hash=state_hash,
-                budget_remaining=tracker.check_budget()
+                budget_remaining=remaining
             )
             
             event = TraceEvent(
                 task_id=task_id,
                 step_idx=step_idx,
-                step_name=step["step_name"],
+                step_name=step_name,
                 tool_name=tool_name,
                 params=params,
                 status=result.status,
@@ -174,29 +218,29 @@ class BaselineRunner:
                 error_type=result.error_type,
                 injected_fault=result.injected_fault,
                 state_hash=state_hash,
-                budget=budget_snapshot["remaining"],
+                budget=remaining,
                 recovery_action=None,
-                ts_ms=int(time.time() * 1000),
+                ts_ms=timestamp_ms(now),
                 attempt_idx=attempt_idx,
                 event_type="tool_call",
-                budget_remaining_tokens=budget_snapshot["remaining"]["tokens"],
-                budget_remaining_tool_calls=budget_snapshot["remaining"]["tool_calls"],
-                budget_remaining_time_s=budget_snapshot["remaining"]["time"],
-                budget_used_tokens=budget_snapshot["used"]["tokens"],
-                budget_used_tool_calls=budget_snapshot["used"]["tool_calls"],
-                budget_used_time_s=budget_snapshot["used"]["time"],
+                budget_remaining_tokens=remaining["tokens"],
+                budget_remaining_tool_calls=remaining["tool_calls"],
+                budget_remaining_time_s=remaining["time"],
+                budget_used_tokens=used["tokens"],
+                budget_used_tool_calls=used["tool_calls"],
+                budget_used_time_s=used["time"],
                 compensation_action=None,
                 saga_stack_depth=0,
                 diagnosis=None
             )
             
-            # 消耗预算
-            tokens = tracker.estimate_tokens(params)
-            tracker.consume(tokens=tokens, tool_calls=1)
+            # 消耗预算（consume 内联：直接累加到本任务的 budget）
+            budget.used_tokens += tracker.estimate_tokens(params)
+            budget.used_tool_calls += 1
             
             if result.status == "ok":
-                self.logger.append(event)
-                checkpoint = world_state.deep_copy()
+                append_event(event)
+                checkpoint = None
                 retry_counts[step_idx] = 0
                 step_idx += 1
             else:
@@ -215,11 +259,11 @@ class BaselineRunner:
                 payload = decision.payload
 
                 recovery_label = action
-                if self.mode == "B4" and decision.source in ["memory", "diagnosis"]:
+                if self.mode == "B4" and decision.source in _LABELED_SOURCES:
                     recovery_label = f"{decision.source}:{action}"
                 event.recovery_action = recovery_label
                 event.diagnosis = payload
-                self.logger.append(event)
+                append_event(event)
 
                 if first_failure_action is None:
                     first_failure_action = action
@@ -235,31 +279,28 @@ class BaselineRunner:
                 
                 elif action == "retry":
                     retry_counts[step_idx] = retry_counts.get(step_idx, 0) + 1
-                    if self.mode == "B1":
-                        time.sleep(0.05)
-                    elif self.mode in ["B2", "B3", "B4"]:
-                        backoff = 0.1 * (2 ** (retry_counts[step_idx] - 1))
-                        time.sleep(min(backoff, 0.4))
+                    if self.simulate_latency:
+                        if self.mode == "B1":
+                            time.sleep(0.05)
+                        elif self.mode in _BACKOFF_MODES:
+                            backoff = 0.1 * (2 ** (retry_counts[step_idx] - 1))
+                            time.sleep(min(backoff, 0.4))
                     continue
                 
-                elif action == "rollback_then_retry":
+                elif action == "rollback_then_retry" or action == "rollback":
                     # Internal rollback: deep-copy checkpoint state and record rollback in audit_log
-                    # (used by stateful faults that clear on rollback observation)
-                    world_state.records = json.loads(json.dumps(checkpoint.records))
-                    world_state.inventory = json.loads(json.dumps(checkpoint.inventory))
-                    world_state.audit_log = json.loads(json.dumps(checkpoint.audit_log)) + [
-                        {"action": "rollback", "timestamp": int(time.time())}
-                    ]
-                    retry_counts[step_idx] = retry_counts.get(step_idx, 0) + 1
-                    continue
-                
-                elif action == "rollback":
-                    # Same behavior as rollback_then_retry in this simplified runner
-                    world_state.records = json.loads(json.dumps(checkpoint.records))
-                    world_state.inventory = json.loads(json.dumps(checkpoint.inventory))
-                    world_state.audit_log = json.loads(json.dumps(checkpoint.audit_log)) + [
-                        {"action": "rollback", "timestamp": int(time.time())}
-                    ]
+                    # (used by stateful faults that clear on rollback observation).
+                    # "rollback" behaves the same as rollback_then_retry in this simplified runner.
+                    if checkpoint is None:
+                        # 当前状态就是上次成功后的状态：把现有容器直接交给快照，下面只复制一次
+                        checkpoint = WorldState(
+                            records=world_state.records,
+                            inventory=world_state.inventory,
+                            audit_log=world_state.audit_log,
+                        )
+                    world_state.restore_from(checkpoint)
+                    world_state.audit_log.append({"action": "rollback", "timestamp": int(time.time())})
+                    world_state.touch("audit_log")
                     retry_counts[step_idx] = retry_counts.get(step_idx, 0) + 1
                     continue
                 
@@ -288,212 +329,165 @@ class BaselineRunner:
     
     def _execute_step(self, world_state: WorldState, tool_name: str, params: dict, fault_injection):
         """执行单个步骤"""
-        tool_map = {
-            "get_record": mock_api.get_record,
-            "auth_check": mock_api.auth_check,
-            "policy_check": mock_api.policy_check,
-            "update_record": mock_api.update_record,
-            "send_message": mock_api.send_message,
-            "notify_user": mock_api.notify_user,
-            "create_ticket": mock_api.create_ticket,
-            "commit": mock_api.commit,
-            "rollback": mock_api.rollback,
-            "lock_inventory": mock_api.lock_inventory,
-            "unlock_inventory": mock_api.unlock_inventory,
-            "process_payment": mock_api.process_payment,
-            "refund_payment": mock_api.refund_payment,
-            "write_audit": mock_api.write_audit,
-        }
-        
-        tool_func = tool_map.get(tool_name)
-        if not tool_func:
-            raise ValueError(f"Unknown tool: {tool_name}")
+        try:
+            tool_func = self._TOOL_MAP[tool_name]
+        except KeyError:
+            raise ValueError(f"Unknown tool: {tool_name}") from None
         
         return tool_func(world_state, **params, fault_injection=fault_injection)
     
     def _default_payload(self, error_type: str, action: str, source: str, note: str) -> dict:
-        default_layer = (
-            "semantic"
-            if error_type in ["PolicyRejected", "AuthDenied", "BadRequest"]
-            else "persistent"
+        # 返回共享的缓存 dict，调用方（event.diagnosis）只读不改
+        return _cached_default_payload(error_type, action, source, note)
+
+    # 各模式的恢复决策方法签名一致，__init__ 中按 mode 绑定为 self._get_recovery_action：
+    # (result, step_idx, retry_counts, world_state, checkpoint,
+    #  step_context=None, history_events=None, fault_signature=None) -> RecoveryDecision
+
+    def _decide_b0(self, result, step_idx, retry_counts, world_state, checkpoint,
+                   step_context=None, history_events=None, fault_signature=None) -> RecoveryDecision:
+        """B0: 不做恢复"""
+        return RecoveryDecision(
+            "fail",
+            self._default_payload(result.error_type, "fail", "rule", "no-recovery"),
+            "rule",
         )
-        return {
-            "layer_pred": default_layer,
-            "action_pred": action,
-            "confidence": 0.5,
-            "rationale_short": note,
-            "source": source,
-        }
 
-    def _low_confidence_fallback_action(
-        self,
-        error_type: str,
-        b2_action: str,
-        current_retries: int,
-        step_context: Optional[StepContext],
-        result,
-    ) -> str:
-        """
-        When diagnosis confidence is low, avoid immediately escalating for
-        potentially transient errors like NotFound (eventual consistency).
-        """
-        if error_type == "NotFound" and step_context is not None:
-            # Allow a couple of quick retries before escalating; keeps B3/B4 from
-            # over-escalating due to mock diagnosis noise.
-            if current_retries < 2:
-                return "retry"
-        return b2_action
+    def _decide_b1(self, result, step_idx, retry_counts, world_state, checkpoint,
+                   step_context=None, history_events=None, fault_signature=None) -> RecoveryDecision:
+        """B1: 朴素重试"""
+        action = "retry" if retry_counts.get(step_idx, 0) < 3 else "fail"
+        return RecoveryDecision(
+            action,
+            self._default_payload(result.error_type, action, "rule", "naive-retry"),
+            "rule",
+        )
 
-    def _apply_safety_guard(
-        self,
-        action: str,
-        current_retries: int,
-        step_context: Optional[StepContext],
-    ) -> str:
-        if step_context and step_context.budget_remaining.get("tool_calls", 0) <= 1:
-            if action in ["retry", "rollback"]:
-                return "escalate"
-        if action in ["retry", "rollback"] and current_retries >= 3:
-            return "escalate"
-        return action
+    def _decide_b2(self, result, step_idx, retry_counts, world_state, checkpoint,
+                   step_context=None, history_events=None, fault_signature=None) -> RecoveryDecision:
+        """B2: 规则恢复"""
+        b2_action = self._get_recovery_action_b2(result, step_idx, retry_counts)
+        return RecoveryDecision(
+            b2_action,
+            self._default_payload(result.error_type, b2_action, "rule", "rule-based"),
+            "rule",
+        )
 
-    def _get_recovery_action(
-        self,
-        result,
-        step_idx: int,
-        retry_counts: dict,
-        world_state: WorldState,
-        checkpoint: WorldState,
-        step_context: StepContext | None = None,
-        history_events: list | None = None,
-        fault_signature: Optional[FaultSignature] = None,
-    ) -> RecoveryDecision:
-        """根据 baseline 模式决定恢复动作"""
+    def _decide_b3(self, result, step_idx, retry_counts, world_state, checkpoint,
+                   step_context=None, history_events=None, fault_signature=None) -> RecoveryDecision:
+        """B3: 诊断驱动恢复 + 安全回退"""
         error_type = result.error_type
         current_retries = retry_counts.get(step_idx, 0)
         b2_action = self._get_recovery_action_b2(result, step_idx, retry_counts)
 
-        if self.mode == "B0":
+        if step_context is None or history_events is None:
             return RecoveryDecision(
-                "fail",
-                self._default_payload(error_type, "fail", "rule", "no-recovery"),
+                b2_action,
+                self._default_payload(error_type, b2_action, "rule", "missing-context"),
                 "rule",
             )
 
-        if self.mode == "B1":
-            action = "retry" if current_retries < 3 else "fail"
-            return RecoveryDecision(
-                action,
-                self._default_payload(error_type, action, "rule", "naive-retry"),
-                "rule",
-            )
+        diagnosis = self.diagnosis_agent.diagnose(step_context, result, history_events)
+        # 模拟 LLM 诊断延迟
+        if self.simulate_latency:
+            time.sleep(0.05)
+        self.llm_calls += 1
+        payload = {
+            "layer_pred": diagnosis.layer,
+            "action_pred": diagnosis.action,
+            "confidence": diagnosis.confidence,
+            "rationale_short": diagnosis.reasoning[:120],
+            "source": "diagnosis",
+        }
+
+        action = diagnosis.action
+        if diagnosis.confidence < 0.7:
+            # 低置信度回退：NotFound 可能是最终一致性，先快速重试两次再走 B2 规则
+            fallback = "retry" if error_type == "NotFound" and current_retries < 2 else b2_action
+            action = fallback
+            payload["rationale_short"] = "diagnosis_low_confidence_fallback"
+            payload["fallback_action"] = fallback
+
+        # 安全护栏：重试/回滚次数过多或 tool_calls 即将耗尽时升级
+        guarded = action
+        if action in _GUARDED_ACTIONS and (
+            current_retries >= 3 or step_context.budget_remaining.get("tool_calls", 0) <= 1
+        ):
+            guarded = "escalate"
+        if guarded != action:
+            payload["final_action"] = guarded
+        return RecoveryDecision(guarded, payload, "diagnosis")
+
+    def _decide_b4(self, result, step_idx, retry_counts, world_state, checkpoint,
+                   step_context=None, history_events=None, fault_signature=None) -> RecoveryDecision:
+        """B4: 先查经验记忆，未命中再走诊断"""
+        error_type = result.error_type
+        current_retries = retry_counts.get(step_idx, 0)
+        b2_action = self._get_recovery_action_b2(result, step_idx, retry_counts)
 
-        if self.mode == "B2":
+        if step_context is None or history_events is None:
             return RecoveryDecision(
                 b2_action,
-                self._default_payload(error_type, b2_action, "rule", "rule-based"),
+                self._default_payload(error_type, b2_action, "rule", "missing-context"),
                 "rule",
             )
 
-        if self.mode == "B3":
-            # diagnosis-driven recovery with safety fallback
-            if step_context is None or history_events is None:
-                return RecoveryDecision(
-                    b2_action,
-                    self._default_payload(error_type, b2_action, "rule", "missing-context"),
-                    "rule",
-                )
-
-            diagnosis = self.diagnosis_agent.diagnose(step_context, result, history_events)
-            # 模拟 LLM 诊断延迟
-            time.sleep(0.05)
-            self.llm_calls += 1
-            payload = {
-                "layer_pred": diagnosis.layer,
-                "action_pred": diagnosis.action,
-                "confidence": diagnosis.confidence,
-                "rationale_short": diagnosis.reasoning[:120],
-                "source": "diagnosis",
-            }
-
-            action = diagnosis.action
-            if diagnosis.confidence < 0.7:
-                fallback = self._low_confidence_fallback_action(
-                    error_type, b2_action, current_retries, step_context, result
-                )
-                action = fallback
-                payload["rationale_short"] = "diagnosis_low_confidence_fallback"
-                payload["fallback_action"] = fallback
-
-            guarded = self._apply_safety_guard(action, current_retries, step_context)
-            if guarded != action:
-                payload["final_action"] = guarded
-            return RecoveryDecision(guarded, payload, "diagnosis")
-
-        if self.mode == "B4":
-            if step_context is None or history_events is None:
-                return RecoveryDecision(
-                    b2_action,
-                    self._default_payload(error_type, b2_action, "rule", "missing-context"),
-                    "rule",
-                )
-
-            if self.memory_bank is not None and fault_signature is not None:
-                mem_action, mem_conf, matched_key = self.memory_bank.query(
-                    fault_signature
-                )
-                if mem_action and mem_conf >= self.memory_threshold:
-                    payload = {
-                        "layer_pred": None,
-                        "action_pred": mem_action,
-                        "confidence": mem_conf,
-                        "rationale_short": "memory-hit",
-                        "source": "memory",
-                        "signature": fault_signature.to_key(),
-                        "matched_key": matched_key,
-                    }
-                    guarded = self._apply_safety_guard(
-                        mem_action, current_retries, step_context
-                    )
-                    if guarded != mem_action:
-                        payload["final_action"] = guarded
-                        payload["overridden"] = True
-                    return RecoveryDecision(guarded, payload, "memory")
-
-            diagnosis = self.diagnosis_agent.diagnose(step_context, result, history_events)
-            self.llm_calls += 1
-            payload = {
-                "layer_pred": diagnosis.layer,
-                "action_pred": diagnosis.action,
-                "confidence": diagnosis.confidence,
-                "rationale_short": diagnosis.reasoning[:120],
-                "source": "diagnosis",
-            }
-            action = diagnosis.action
-            if diagnosis.confidence < 0.7:
-                fallback = self._low_confidence_fallback_action(
-                    error_type, b2_action, current_retries, step_context, result
-                )
-                action = fallback
-                payload["rationale_short"] = "diagnosis_low_confidence_fallback"
-                payload["fallback_action"] = fallback
-            guarded = self._apply_safety_guard(action, current_retries, step_context)
-            if guarded != action:
-                payload["final_action"] = guarded
-            return RecoveryDecision(guarded, payload, "diagnosis")
-
-        return RecoveryDecision(
-            "fail",
-            self._default_payload(error_type, "fail", "rule", "fallback"),
-            "rule",
-        )
+        if self.memory_bank is not None and fault_signature is not None:
+            mem_action, mem_conf, matched_key = self.memory_bank.query(
+                fault_signature
+            )
+            if mem_action and mem_conf >= self.memory_threshold:
+                payload = {
+                    "layer_pred": None,
+                    "action_pred": mem_action,
+                    "confidence": mem_conf,
+                    "rationale_short": "memory-hit",
+                    "source": "memory",
+                    "signature": fault_signature.to_key(),
+                    "matched_key": matched_key,
+                }
+                guarded = mem_action
+                if mem_action in _GUARDED_ACTIONS and (
+                    current_retries >= 3 or step_context.budget_remaining.get("tool_calls", 0) <= 1
+                ):
+                    guarded = "escalate"
+                if guarded != mem_action:
+                    payload["final_action"] = guarded
+                    payload["overridden"] = True
+                return RecoveryDecision(guarded, payload, "memory")
+
+        diagnosis = self.diagnosis_agent.diagnose(step_context, result, history_events)
+        self.llm_calls += 1
+        payload = {
+            "layer_pred": diagnosis.layer,
+            "action_pred": diagnosis.action,
+            "confidence": diagnosis.confidence,
+            "rationale_short": diagnosis.reasoning[:120],
+            "source": "diagnosis",
+        }
+        action = diagnosis.action
+        if diagnosis.confidence < 0.7:
+            # 低置信度回退：NotFound 可能是最终一致性，先快速重试两次再走 B2 规则
+            fallback = "retry" if error_type == "NotFound" and current_retries < 2 else b2_action
+            action = fallback
+            payload["rationale_short"] = "diagnosis_low_confidence_fallback"
+            payload["fallback_action"] = fallback
+        # 安全护栏：重试/回滚次数过多或 tool_calls 即将耗尽时升级
+        guarded = action
+        if action in _GUARDED_ACTIONS and (
+            current_retries >= 3 or step_context.budget_remaining.get("tool_calls", 0) <= 1
+        ):
+            guarded = "escalate"
+        if guarded != action:
+            payload["final_action"] = guarded
+        return RecoveryDecision(guarded, payload, "diagnosis")
     
     def _get_recovery_action_b2(self, result, step_idx: int, retry_counts: dict) -> str:
         """B2 logic for fallback"""
         error_type = result.error_type
         current_retries = retry_counts.get(step_idx, 0)
         
-        if error_type in ["Timeout", "HTTP_500"]:
+        if error_type in _TRANSIENT_ERRORS:
             if current_retries < 3:
                 return "retry"
             else:
@@ -503,7 +497,7 @@ class BaselineRunner:
                 return "rollback"
             else:
                 return "escalate"
-        elif error_type in ["PolicyRejected", "AuthDenied"]:
+        elif error_type in _ESCALATE_ERRORS:
             return "escalate"
         else:
             return "escalate"
@@ -525,7 +519,9 @@ class BaselineRunner:
         final_outcome: str,
         reason: str | None
     ):
-        budget_snapshot = tracker.snapshot()
+        now = time.perf_counter()
+        budget_snapshot = tracker.snapshot(now)
+        remaining, used = budget_snapshot["remaining"], budget_snapshot["used"]
         final_event = TraceEvent(
             task_id=task_id,
             step_idx=step_idx,
@@ -537,17 +533,17 @@ class BaselineRunner:
             error_type=None,
             injected_fault=None,
             state_hash="",
-            budget=budget_snapshot["remaining"],
+            budget=remaining,
             recovery_action=None,
-            ts_ms=int(time.time() * 1000),
+            ts_ms=timestamp_ms(now),
             attempt_idx=0,
             event_type="final",
-            budget_remaining_tokens=budget_snapshot["remaining"]["tokens"],
-            budget_remaining_tool_calls=budget_snapshot["remaining"]["tool_calls"],
-            budget_remaining_time_s=budget_snapshot["remaining"]["time"],
-            budget_used_tokens=budget_snapshot["used"]["tokens"],
-            budget_used_tool_calls=budget_snapshot["used"]["tool_calls"],
-            budget_used_time_s=budget_snapshot["used"]["time"],
+            budget_remaining_tokens=remaining["tokens"],
+            budget_remaining_tool_calls=remaining["tool_calls"],
+            budget_remaining_time_s=remaining["time"],
+            budget_used_tokens=used["tokens"],
+            budget_used_tool_calls=used["tool_calls"],
+            budget_used_time_s=used["time"],
             final_outcome=final_outcome,
             final_reason=reason,
             compensation_action=None,
@@ -556,6 +552,36 @@ class BaselineRunner:
         self.logger.append(final_event)
 
 
+def iter_tasks(tasks_path: str) -> Iterator[dict]:
+    """逐行流式读取 tasks.jsonl（二进制读取，省去逐行解码），不一次性持有整个文件"""
+    with open(tasks_path, 'rb', buffering=_READ_BUFFER_SIZE) as f:
+        for line in f:
+            yield _loads(line)
+
+
+def load_tasks(tasks_path: str) -> list[dict]:
+    """读取全部任务"""
+    return list(iter_tasks(tasks_path))
+
+
+def _run_task_chunk(
+    mode: str,
+    seed: int,
+    diagnosis_mode: str,
+    simulate_latency: bool,
+    tasks: list[dict],
+) -> tuple[list[dict], list[TraceEvent], int]:
+    """并行 worker（进程或线程）：用独立的 runner 顺序执行一段连续任务"""
+    runner = BaselineRunner(
+        mode=mode,
+        seed=seed,
+        diagnosis_mode=diagnosis_mode,
+        simulate_latency=simulate_latency,
+    )
+    results = [runner.run_task(task) for task in tasks]
+    return results, runner.logger.events, runner.llm_calls
+
+
 def run(
     tasks_path: str,
     mode: str,
@@ -563,28 +589,36 @@ def run(
     diagnosis_mode: str = "mock",
     out_path: Optional[str] = None,
     memory_path: Optional[str] = None,
+    simulate_latency: bool = True,
+    parallel: int = 1,
+    executor: str = "process",
 ) -> str:
-    """运行 baseline 实验"""
+    """运行 baseline 实验（parallel > 1 时分段并行执行任务）
+
+    executor: "process" 适合 CPU 密集；"thread" 适合以模拟延迟/退避 sleep 为主的运行，
+    sleep 会释放 GIL，多个任务的等待可以重叠，且无需进程间传输轨迹。
+    """
     
     if mode == "B4" and memory_path is None:
         memory_path = "memory_bank.json"
+    if mode == "B4" and parallel > 1:
+        # B4 的经验记忆依赖任务顺序（前面任务写入、后面任务命中），不能拆分并行
+        print("B4 learns across tasks in order; ignoring --parallel and running sequentially.")
+        parallel = 1
 
     # 加载任务
-    tasks = []
-    with open(tasks_path, 'r') as f:
-        for line in f:
-            tasks.append(json.loads(line))
+    tasks = load_tasks(tasks_path)
     
     print(f"\n{'='*60}")
-    if mode in ["B3", "B4"]:
+    if mode in _DIAGNOSIS_MODES:
         print(f"Running Baseline: {mode} (diagnosis_mode={diagnosis_mode})")
     else:
         print(f"Running Baseline: {mode}")
     print(f"Tasks: {len(tasks)}, Seed: {seed}")
     print(f"{'='*60}\n")
     
-    # 设置随机种子确保可复现
-    random.seed(seed)
+    # 可复现性来自 mock_api._seeded_random：故障注入与模拟延迟按 (SEED, task_id, fault_id)
+    # 派生种子，与任务执行顺序、所在 worker 无关，因此无需设置全局随机种子
     
     # 运行任务
     runner = BaselineRunner(
@@ -592,31 +626,57 @@ def run(
         seed=seed,
         diagnosis_mode=diagnosis_mode,
         memory_path=memory_path,
+        simulate_latency=simulate_latency,
+        memory_autosave=False,  # B4 记忆库在运行结束时写一次，而不是每次 upsert 都重写整个 JSON
     )
     results = []
     
-    for i, task in enumerate(tasks):
-        result = runner.run_task(task)
-        results.append(result)
-        
-        status_symbol = "✓" if result["status"] == "success" else "✗"
-        print(f"[{i+1:2d}/{len(tasks)}] {status_symbol} {result['task_id']}: {result['status']}")
+    if parallel > 1:
+        # 任务之间相互独立（随机性都按 task/fault 取种子），切成连续分段交给子进程，
+        # 按提交顺序合并结果与轨迹，输出与顺序执行一致（计时字段除外）
+        chunk_size = max(1, -(-len(tasks) // (parallel * 4)))
+        chunks = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+        pool_cls = ThreadPoolExecutor if executor == "thread" else ProcessPoolExecutor
+        with pool_cls(max_workers=parallel) as pool:
+            for chunk_results, chunk_events, chunk_llm_calls in pool.map(
+                _run_task_chunk,
+                repeat(mode), repeat(seed), repeat(diagnosis_mode), repeat(simulate_latency),
+                chunks,
+            ):
+                results.extend(chunk_results)
+                runner.logger.events.extend(chunk_events)
+                runner.llm_calls += chunk_llm_calls
+        for i, result in enumerate(results):
+            status_symbol = "✓" if result["status"] == "success" else "✗"
+            print(f"[{i+1:2d}/{len(tasks)}] {status_symbol} {result['task_id']}: {result['status']}")
+    else:
+        try:
+            for i, task in enumerate(tasks):
+                result = runner.run_task(task)
+                results.append(result)
+
+                status_symbol = "✓" if result["status"] == "success" else "✗"
+                print(f"[{i+1:2d}/{len(tasks)}] {status_symbol} {result['task_id']}: {result['status']}")
+        finally:
+            if runner.memory_bank is not None:
+                runner.memory_bank.flush()
     
     # 保存轨迹
     traces_path = out_path or f"traces_{mode}.jsonl"
     runner.logger.flush_jsonl(traces_path)
     
     # 统计
-    success_count = sum(1 for r in results if r["status"] == "success")
-    failed_count = sum(1 for r in results if r["status"] == "failed")
-    escalated_count = sum(1 for r in results if r["status"] == "escalated")
+    status_counts = Counter(r["status"] for r in results)
+    success_count = status_counts["success"]
+    failed_count = status_counts["failed"]
+    escalated_count = status_counts["escalated"]
     
     print(f"\n{'='*60}")
     print(f"Results for {mode}:")
     print(f"  Success:   {success_count:2d}/{len(tasks)} ({success_count/len(tasks)*100:.1f}%)")
     print(f"  Failed:    {failed_count:2d}/{len(tasks)} ({failed_count/len(tasks)*100:.1f}%)")
     print(f"  Escalated: {escalated_count:2d}/{len(tasks)} ({escalated_count/len(tasks)*100:.1f}%)")
-    if mode in ["B3", "B4"]:
+    if mode in _DIAGNOSIS_MODES:
         print(f"  LLM Diagnose Calls: {runner.llm_calls}")
     if mode == "B4":
         if memory_path:
@@ -634,6 +694,12 @@ if __name__ == "__main__":
     parser.add_argument("--diagnosis-mode", choices=["mock", "llm"], default="mock")
     parser.add_argument("--out", default=None)
     parser.add_argument("--memory", default=None)
+    parser.add_argument("--no-latency", dest="simulate_latency", action="store_false",
+                        help="Skip simulated tool/LLM latency and retry backoff sleeps")
+    parser.add_argument("--parallel", type=int, default=1,
+                        help="Workers for independent tasks (B4 always runs sequentially)")
+    parser.add_argument("--executor", choices=["process", "thread"], default="process",
+                        help="Worker kind for --parallel; 'thread' overlaps latency/backoff sleeps")
     args = parser.parse_args()
     
     traces_path = run(
@@ -643,5 +709,8 @@ if __name__ == "__main__":
         args.diagnosis_mode,
         out_path=args.out,
         memory_path=args.memory,
+        simulate_latency=args.simulate_latency,
+        parallel=args.parallel,
+        executor=args.executor,
     )
     print(f"Traces saved to: {traces_path}")
@@ -1,10 +1,29 @@
+import functools
 import hashlib
 import json
 import re
 from typing import List, Dict, Optional
 from dataclasses import dataclass
 from state import StepContext, StepResult, TraceEvent
-from prompts import DIAGNOSIS_SYSTEM_PROMPT
+
+
+# Keyword heuristics for layer classification, checked in priority order
+# (one compiled alternation per layer; the first layer with any hit wins).
+_LAYER_PATTERNS = (
+    ("transient", re.compile("timeout|http_500|temporar|throttle")),
+    ("cascade", re.compile("conflict|rollback|state")),
+    ("semantic", re.compile("auth|policy|badrequest|validation")),
+)
+
+
+@functools.lru_cache(maxsize=1024)
+def _classify_layer(error_type: str, error_msg: str, step_name: str) -> str:
+    """Keyword-based layer guess; inputs come from small fixed sets, so results are memoized."""
+    message = f"{error_type} {error_msg} {step_name}".lower()
+    for layer, pattern in _LAYER_PATTERNS:
+        if pattern.search(message):
+            return layer
+    return "persistent"  # also covers notfound/missing
 
 
 @dataclass
@@ -81,24 +100,8 @@ class DiagnosisAgent:
         hinted_layer = injected.get("layer_gt")
         scenario = injected.get("scenario")
         
-        # Count retries for this step
-        retry_count = sum(
-            1 for e in history_events 
-            if e.step_idx == step_context.step_idx and e.status == "error"
-        )
-        
         # Heuristic layer classification (no ground-truth helper)
-        message = f"{error_type} {error_msg} {step_name}".lower()
-        if any(token in message for token in ["timeout", "http_500", "temporar", "throttle"]):
-            layer = "transient"
-        elif any(token in message for token in ["conflict", "rollback", "state"]):
-            layer = "cascade"
-        elif any(token in message for token in ["auth", "policy", "badrequest", "validation"]):
-            layer = "semantic"
-        elif any(token in message for token in ["notfound", "missing"]):
-            layer = "persistent"
-        else:
-            layer = "persistent"
+        layer = _classify_layer(error_type, error_msg, step_name)
 
 
         # If fault injection provides a layer override (for controlled experiments), use it
@@ -107,7 +110,8 @@ class DiagnosisAgent:
 
         # Deterministic noise to avoid perfect accuracy
         noise_seed = f"{step_context.task_id}:{error_type}:{step_context.step_idx}"
-        noise_hash = int(hashlib.md5(noise_seed.encode()).hexdigest(), 16)
+        # int.from_bytes(digest) == int(hexdigest, 16), without the hex round trip
+        noise_hash = int.from_bytes(hashlib.md5(noise_seed.encode()).digest(), "big")
         if noise_hash % 10 == 0:
             layer = "persistent"
             confidence_override = 0.55
@@ -198,7 +202,8 @@ class DiagnosisAgent:
             "state_hash": step_context.state_hash
         }
         
-        # In production, call LLM API:
+        # In production, call LLM API (prompts is imported lazily: only the LLM path needs it):
+        from prompts import DIAGNOSIS_SYSTEM_PROMPT  # noqa: F401
         # response = call_llm_api(DIAGNOSIS_SYSTEM_PROMPT, json.dumps(llm_input))
         # diagnosis_json = json.loads(response)
         
@@ -1,16 +1,54 @@
 import argparse
 import json
-from typing import List
+import mmap
+import os
+from typing import Dict, List, Tuple
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-def _load_events(path: str) -> dict:
+
+if orjson is not None:
+    def _dumps_compact(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+else:
+    # Same compact, non-escaped UTF-8 form orjson emits, so output does not depend on it
+    _dumps_compact = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+
+def _load_events(path: str) -> Tuple[Dict[str, List[dict]], List[Tuple[int, int, str]]]:
+    """Group events by task and collect memory-bypass hits in the same pass.
+
+    Hits are (task_order, event_idx, task_id), task_order being the position of the
+    task's first event, so sorting them reproduces the task-by-task scan order.
+    """
+    # orjson parses the raw bytes directly; json.loads accepts bytes too
+    loads = orjson.loads if orjson is not None else json.loads
     tasks = {}
-    with open(path, "r") as f:
-        for line in f:
-            event = json.loads(line)
-            tasks.setdefault(event["task_id"], []).append(event)
+    task_order = {}
+    memory_hits = []
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return tasks, memory_hits  # mmap cannot map an empty file
+        # Map the file and let the kernel page it in on demand instead of
+        # copying it through Python's buffered reader.
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for line in iter(mm.readline, b""):
+                if not line.strip():
+                    continue
+                event = loads(line)
+                task_id = event["task_id"]
+                events = tasks.get(task_id)
+                if events is None:
+                    events = tasks[task_id] = []
+                    task_order[task_id] = len(task_order)
+                if (event.get("recovery_action") or "").startswith("memory:"):
+                    memory_hits.append((task_order[task_id], len(events), task_id))
+                events.append(event)
     # keep input order; no sorting to preserve traces
-    return tasks
+    return tasks, memory_hits
 
 
 def _format_event(event: dict) -> str:
@@ -24,36 +62,34 @@ def _format_event(event: dict) -> str:
         "recovery_action": event.get("recovery_action"),
         "diagnosis_source": (event.get("diagnosis") or {}).get("source"),
     }
-    return json.dumps(payload, ensure_ascii=False)
+    return _dumps_compact(payload)
 
 
 def extract_cases(traces_path: str, k: int) -> List[str]:
-    tasks = _load_events(traces_path)
+    tasks, memory_hits = _load_events(traces_path)
+    # Already in order unless tasks interleave in the trace file.
+    memory_hits.sort()
     outputs = []
-    for task_id, events in tasks.items():
-        for idx, event in enumerate(events):
-            recovery_action = event.get("recovery_action") or ""
-            if not recovery_action.startswith("memory:"):
-                continue
-            diagnosis = event.get("diagnosis") or {}
-            signature = diagnosis.get("signature")
-            confidence = diagnosis.get("confidence")
-            chosen_action = recovery_action.split(":", 1)[1]
+    for _, idx, task_id in memory_hits[:max(k, 1)]:  # at least one case, even for k <= 0
+        events = tasks[task_id]
+        event = events[idx]
+        diagnosis = event.get("diagnosis") or {}
+        signature = diagnosis.get("signature")
+        confidence = diagnosis.get("confidence")
+        chosen_action = event["recovery_action"].split(":", 1)[1]
 
-            header = (
-                f"task_id={task_id} step={event.get('step_name')} "
-                f"error_type={event.get('error_type')} action={chosen_action} "
-                f"confidence={confidence} signature={signature}"
-            )
-            context_start = max(0, idx - 3)
-            context_end = min(len(events), idx + 4)
-            context_lines = [
-                _format_event(e) for e in events[context_start:context_end]
-            ]
-            block = "\n".join([header, *context_lines])
-            outputs.append(block)
-            if len(outputs) >= k:
-                return outputs
+        header = (
+            f"task_id={task_id} step={event.get('step_name')} "
+            f"error_type={event.get('error_type')} action={chosen_action} "
+            f"confidence={confidence} signature={signature}"
+        )
+        context_start = max(0, idx - 3)
+        context_end = min(len(events), idx + 4)
+        context_lines = [
+            _format_event(e) for e in events[context_start:context_end]
+        ]
+        block = "\n".join([header, *context_lines])
+        outputs.append(block)
     return outputs
 
 
@@ -1,322 +1,403 @@
 import argparse
+import csv
+import heapq
 import os
 import re
+import sys
+import metrics
 from metrics import compute_metrics
 
-try:
-    import pandas as pd
-except ModuleNotFoundError:  # pragma: no cover
-    pd = None
+_SEP = "=" * 80
+_LABEL_RE = re.compile(r"B\d+")
+_SEP_NL = "\n" + _SEP
 
+# trace 总大小低于此值时顺序计算：进程池启动与结果 pickle 的开销大于并行收益
+# （约 1 万条事件，与 metrics._PARALLEL_MIN_EVENTS 同量级）
+_PARALLEL_MIN_BYTES = 8 * 1024 * 1024
 
-def _infer_label(path: str) -> str:
-    base = os.path.basename(path)
-    match = re.search(r"B\d+", base)
-    return match.group(0) if match else base
+# AWRR_LEADERBOARD_CACHE=1 开启 compute_metrics 结果的磁盘缓存（按 trace 文件指纹）
+_CACHE_ENV = "AWRR_LEADERBOARD_CACHE"
+_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "awrr", "leaderboard")
 
 
-def _fmt_pp(delta: float) -> str:
-    return f"{delta:+.1f}pp"
+def _cached_compute_metrics(traces_path: str, baseline: str) -> dict:
+    """compute_metrics with an opt-in on-disk cache keyed by (path, mtime, size, baseline).
 
-def _fmt_pct(x: float) -> str:
-    return f"{x:.2%}"
+    The mtime of metrics.py is part of the key, so editing the metric definitions
+    invalidates old entries.
+    """
+    if os.environ.get(_CACHE_ENV) != "1":
+        return compute_metrics(traces_path, baseline)
+    # 缓存默认关闭，只在开启时才导入它用到的模块
+    import hashlib
+    import pickle
+    import tempfile
+
+    st = os.stat(traces_path)  # FileNotFoundError propagates like compute_metrics'
+    fingerprint = (
+        f"{os.path.abspath(traces_path)}|{st.st_mtime_ns}|{st.st_size}|{baseline}"
+        f"|{os.stat(metrics.__file__).st_mtime_ns}"
+    )
+    key = hashlib.blake2b(fingerprint.encode(), digest_size=16).hexdigest()
+    cache_path = os.path.join(_CACHE_DIR, f"{key}.pkl")
+    try:
+        with open(cache_path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        pass
+    result = compute_metrics(traces_path, baseline)
+    try:
+        os.makedirs(_CACHE_DIR, exist_ok=True)
+        # write-then-rename so a concurrent reader never sees a partial pickle
+        fd, tmp_path = tempfile.mkstemp(dir=_CACHE_DIR, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError:
+        pass  # caching is best-effort
+    return result
 
-def _fmt_float(x: float, digits: int = 1) -> str:
-    return f"{x:.{digits}f}"
 
-def _fmt_int(x: int) -> str:
-    return f"{int(x)}"
+def _infer_label(path: str) -> str:
+    base = os.path.basename(path)
+    match = _LABEL_RE.search(base)
+    return match.group(0) if match else base
 
-def _get_row(df_raw, label: str):
-    if pd is None:
-        return next((item for item in df_raw if item["baseline"] == label), None)
-    hits = df_raw[df_raw["baseline"] == label]
-    if hits.empty:
-        return None
-    return hits.iloc[0]
+
+def _format_table(rows: list[dict]) -> str:
+    """Right-aligned text table of already-formatted rows (one column per key)."""
+    headers = list(rows[0])
+    widths = [max(len(h), *(len(row[h]) for row in rows)) for h in headers]
+    # One right-aligned template for every line instead of an rjust() per cell
+    # (generate_leaderboard builds every row with the same keys in the same order).
+    template = " ".join(f"{{:>{w}}}" for w in widths)
+    lines = [template.format(*headers)]
+    lines.extend(template.format(*row.values()) for row in rows)
+    return "\n".join(lines)
+
+def _rows_by_baseline(results: list[dict]) -> dict:
+    """baseline -> row dict, built once so lookups are dict gets instead of scans."""
+    rows = {}
+    for item in results:
+        rows.setdefault(item["baseline"], item)  # first row wins
+    return rows
 
 def _get_val(row, key: str, default=None):
     if row is None:
         return default
-    if pd is None:
-        return row.get(key, default)
-    v = row.get(key, default)
-    # pandas may store dicts as objects; leave as-is.
-    return v if v is not None else default
-
-
-def generate_leaderboard(traces_paths: dict, wide: bool = False, ref: str | None = None) -> tuple:
+    return row.get(key, default)
+
+
+def _fmt_delta(delta: float, labels: tuple, lower_is_better: bool = False) -> str:
+    better, worse = labels
+    improved, regressed = (delta < 0, delta > 0) if lower_is_better else (delta > 0, delta < 0)
+    if improved:
+        return f"✓ {better}"
+    if regressed:
+        return f"✗ {worse}"
+    return "= SAME"
+
+
+# print_analysis 用到的数值字段（缺失或 None 记为 0.0）
+_SNAP_KEYS = (
+    "wcr", "rr_task", "rr_event", "mttr_event", "rco", "hir", "llm_calls",
+    "completed", "total_tasks", "escalated", "actual_calls", "baseline_calls",
+)
+
+
+def _snap(row: dict) -> dict:
+    return {k: float(row.get(k) or 0.0) for k in _SNAP_KEYS}
+
+
+def _count_detail(key: str):
+    return lambda v: f"  ({int(v[key])}/{int(v['total_tasks'])})"
+
+
+# B3 vs 参考 baseline 的逐项对比：(key, 标题, 越低越好, (改善/变差标签), 额外说明)
+_REF_COMPARISON_METRICS = (
+    ("wcr", "Workflow Completion Rate (WCR)", False, ("BETTER", "WORSE"), _count_detail("completed")),
+    ("rr_task", "Recovery Rate (RR_task)", False, ("BETTER", "WORSE"), None),
+    ("rr_event", "Recovery Rate (RR_event)", False, ("BETTER", "WORSE"), None),
+    ("mttr_event", "Mean Time To Recovery (MTTR)", True, ("FASTER", "SLOWER"), None),
+    (
+        "rco",
+        "Recovery Cost Overhead (RCO)",
+        True,
+        ("CHEAPER", "COSTLIER"),
+        lambda v: f"  (+{int(v['actual_calls'] - v['baseline_calls'])} calls)",
+    ),
+    ("hir", "Human Intervention Rate (HIR)", True, ("LESS", "MORE"), _count_detail("escalated")),
+)
+
+
+# --ref 对比列：(列名前缀, 指标 key, 格式, 缩放；比例指标 ×100 输出为 pp)
+_DELTA_COLUMNS = (
+    ("ΔWCR", "wcr", "%+.1fpp", 100),
+    ("ΔRR", "rr_task", "%+.1fpp", 100),
+    ("ΔHIR", "hir", "%+.1fpp", 100),
+    ("ΔMTTR", "mttr_event", "%+.1f", 1),
+    ("ΔRCO", "rco", "%+.1fpp", 100),
+    ("ΔCPS", "cps", "%+.2f", 1),
+)
+
+
+# BEST-OF 汇总：(标签, 指标 key, 越高越好, 数值格式)
+_BEST_OF = (
+    ("WCR", "wcr", True, "{:.1%}"),
+    ("RR_task", "rr_task", True, "{:.1%}"),
+    ("HIR(low)", "hir", False, "{:.1%}"),
+    ("MTTR(low)", "mttr_event", False, "{:.1f} ms"),
+    ("RCO(low)", "rco", False, "{:.1%}"),
+    ("CPS(low)", "cps", False, "{:.2f}"),
+)
+
+
+def _total_size(paths) -> int:
+    """trace 文件总字节数（缺失的文件按 0 计，留给后面的 FileNotFoundError 提示）"""
+    total = 0
+    for path in paths:
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            pass
+    return total
+
+
+def generate_leaderboard(
+    traces_paths: dict | list[tuple[str, str]],
+    wide: bool = False,
+    ref: str | None = None,
+    executor: str = "process",
+) -> tuple:
     """
     生成 baseline 对比 leaderboard
     
     Args:
-        traces_paths: {"B0": "traces_B0.jsonl", "B1": "traces_B1.jsonl", ...}
+        traces_paths: {"B0": "traces_B0.jsonl", "B1": "traces_B1.jsonl", ...}，
+            或已排好序的 [(baseline, path), ...]（按给定顺序使用，不再排序）
+        executor: trace 总大小超过 _PARALLEL_MIN_BYTES 时所用的并行方式：
+            "process"（默认，解析是纯 Python、受 GIL 限制）或 "thread"
+            （I/O 为主时省去进程启动和结果 pickle）；更小的输入总是顺序计算
     """
     
     results = []
-    
-    for baseline, traces_path in sorted(traces_paths.items()):
-        print(f"Computing metrics for {baseline}...")
-        try:
-            metrics = compute_metrics(traces_path, baseline)
-            results.append(metrics)
-        except FileNotFoundError:
-            print(f"  Warning: {traces_path} not found, skipping {baseline}")
-        except Exception as e:
-            print(f"  Error computing {baseline}: {e}")
+    jobs = traces_paths if isinstance(traces_paths, list) else sorted(traces_paths.items())
+
+    # 每个 baseline 读取独立的 trace 文件，多个大文件时并行计算；按提交顺序收集结果，保持输出确定
+    pool = None
+    if len(jobs) > 1 and _total_size(path for _, path in jobs) >= _PARALLEL_MIN_BYTES:
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+        pool_cls = ThreadPoolExecutor if executor == "thread" else ProcessPoolExecutor
+        pool = pool_cls(max_workers=min(len(jobs), os.cpu_count() or 1))
+    try:
+        futures = []
+        for baseline, traces_path in jobs:
+            print(f"Computing metrics for {baseline}...")
+            if pool is not None:
+                futures.append(pool.submit(_cached_compute_metrics, traces_path, baseline))
+        for i, (baseline, traces_path) in enumerate(jobs):
+            try:
+                if pool is not None:
+                    result = futures[i].result()
+                else:
+                    result = _cached_compute_metrics(traces_path, baseline)
+                results.append(result)
+            except FileNotFoundError:
+                print(f"  Warning: {traces_path} not found, skipping {baseline}")
+            except Exception as e:
+                print(f"  Error computing {baseline}: {e}")
+    finally:
+        if pool is not None:
+            pool.shutdown()
     
     if not results:
         print("No valid results found")
         return [], []
     
-    llm_calls_map = {item["baseline"]: item.get("llm_calls", 0) for item in results}
-    b3_calls = llm_calls_map.get("B3", 0)
-    llm_reduction_map = {}
-    for item in results:
-        baseline = item["baseline"]
-        if baseline == "B4" and b3_calls:
-            llm_reduction_map[baseline] = (b3_calls - llm_calls_map.get("B4", 0)) / b3_calls
-        else:
-            llm_reduction_map[baseline] = 0.0
-
-    if pd is None:
-        return results, results
-
-    # 转换为 DataFrame
-    df_raw = pd.DataFrame(results)
-
-    ref_row = _get_row(df_raw, ref) if ref else None
-
-    # Core columns (compact but comparable)
-    display = {
-        "Strategy": df_raw["baseline"],
-        "WCR": df_raw["wcr"].apply(_fmt_pct),
-        "RR_task": df_raw["rr_task"].apply(_fmt_pct),
-        "HIR": df_raw["hir"].apply(_fmt_pct),
-        "MTTR (ms)": df_raw["mttr_event"].apply(lambda x: _fmt_float(x, 1)),
-        "RCO": df_raw["rco"].apply(_fmt_pct),
-        "CPS": df_raw["cps"].apply(lambda x: _fmt_float(x, 2)),
-        "LLM_Calls": df_raw["llm_calls"].apply(_fmt_int),
-        "LLM_Reduction": df_raw["baseline"].apply(
-            lambda b: _fmt_pct(llm_reduction_map.get(b, 0.0)) if b == "B4" and b3_calls else "-"
-        ),
-    }
-
-    if wide:
-        display.update(
-            {
-                "RR_event": df_raw["rr_event"].apply(_fmt_pct),
-                "CPT": df_raw["cpt"].apply(lambda x: _fmt_float(x, 2)),
-                "UAR": df_raw["uar"].apply(_fmt_pct),
-                "SRR": df_raw["srr"].apply(_fmt_pct),
-            }
-        )
-
-    if ref_row is not None:
-        ref_wcr = float(_get_val(ref_row, "wcr", 0.0) or 0.0)
-        ref_rr = float(_get_val(ref_row, "rr_task", 0.0) or 0.0)
-        ref_hir = float(_get_val(ref_row, "hir", 0.0) or 0.0)
-        ref_mttr = float(_get_val(ref_row, "mttr_event", 0.0) or 0.0)
-        ref_rco = float(_get_val(ref_row, "rco", 0.0) or 0.0)
-        ref_cps = float(_get_val(ref_row, "cps", 0.0) or 0.0)
-        display.update(
-            {
-                f"ΔWCR vs {ref}": df_raw["wcr"].apply(lambda x: _fmt_pp((x - ref_wcr) * 100)),
-                f"ΔRR vs {ref}": df_raw["rr_task"].apply(lambda x: _fmt_pp((x - ref_rr) * 100)),
-                f"ΔHIR vs {ref}": df_raw["hir"].apply(lambda x: _fmt_pp((x - ref_hir) * 100)),
-                f"ΔMTTR vs {ref}": df_raw["mttr_event"].apply(lambda x: f"{(x - ref_mttr):+.1f}"),
-                f"ΔRCO vs {ref}": df_raw["rco"].apply(lambda x: _fmt_pp((x - ref_rco) * 100)),
-                f"ΔCPS vs {ref}": df_raw["cps"].apply(lambda x: f"{(x - ref_cps):+.2f}"),
-            }
-        )
+    # baseline -> row index, built once for the B3/B4 and reference lookups below
+    rows = _rows_by_baseline(results)
+    b3_calls = _get_val(rows.get("B3"), "llm_calls", 0)
+    llm_reduction = (b3_calls - _get_val(rows.get("B4"), "llm_calls", 0)) / b3_calls if b3_calls else 0.0
+
+    ref_row = rows.get(ref) if ref else None
+    # Δ columns: (header, key, format, scale, reference value), resolved once for all rows
+    delta_columns = [
+        (f"{label} vs {ref}", key, fmt, scale, float(_get_val(ref_row, key, 0.0) or 0.0))
+        for label, key, fmt, scale in _DELTA_COLUMNS
+    ] if ref_row is not None else []
 
-    display_df = pd.DataFrame(display)
     # More informative default ordering: best completion first, then recovery, then faster MTTR.
-    try:
-        display_df = display_df.iloc[
-            df_raw.sort_values(["wcr", "rr_task", "mttr_event"], ascending=[False, False, True]).index
-        ]
-    except Exception:
-        pass
+    ordered = sorted(results, key=lambda r: (-r["wcr"], -r["rr_task"], r["mttr_event"]))
+
+    reduction_cell = f"{llm_reduction:.2%}" if b3_calls else "-"
+    display = []
+    for r in ordered:
+        b = r["baseline"]
+        # Core columns (compact but comparable); formatted inline, no helper call per cell
+        line = {
+            "Strategy": b,
+            "WCR": f"{r['wcr']:.2%}",
+            "RR_task": f"{r['rr_task']:.2%}",
+            "HIR": f"{r['hir']:.2%}",
+            "MTTR (ms)": f"{r['mttr_event']:.1f}",
+            "RCO": f"{r['rco']:.2%}",
+            "CPS": f"{r['cps']:.2f}",
+            "LLM_Calls": f"{int(r['llm_calls'])}",
+            "LLM_Reduction": reduction_cell if b == "B4" else "-",
+        }
+        if wide:
+            line["RR_event"] = f"{r['rr_event']:.2%}"
+            line["CPT"] = f"{r['cpt']:.2f}"
+            line["UAR"] = f"{r['uar']:.2%}"
+            line["SRR"] = f"{r['srr']:.2%}"
+        for header, key, fmt, scale, ref_v in delta_columns:
+            line[header] = fmt % ((r[key] - ref_v) * scale)
+        display.append(line)
 
-    return display_df, df_raw
+    return display, results
 
 
-def print_analysis(df_raw, ref: str = "B2", details: bool = False):
+def print_analysis(results: list[dict], ref: str = "B2", details: bool = False):
     """打印对比分析 - 默认以 B2 为参考"""
-    print("\n" + "="*80)
-    print("COMPARATIVE ANALYSIS")
-    print("="*80)
+    # 先收集所有行，最后一次性写入 stdout（避免几十次逐行 print）
+    lines = []
+    emit = lines.append
+    emit(_SEP_NL)
+    emit("COMPARATIVE ANALYSIS")
+    emit(_SEP)
     
     # 主分析：B2 vs B3
-    baselines = [row["baseline"] for row in df_raw] if pd is None else df_raw["baseline"].values
+    rows = _rows_by_baseline(results)
+    baselines = rows.keys()
+    # Numeric fields of each row, read and float-converted once
+    vals = {b: _snap(row) for b, row in rows.items()}
 
     if "B3" in baselines and "B4" in baselines:
-        b3 = _get_row(df_raw, "B3")
-        b4 = _get_row(df_raw, "B4")
-        b3_calls = int(_get_val(b3, "llm_calls", 0) or 0)
-        b4_calls = int(_get_val(b4, "llm_calls", 0) or 0)
+        b3 = vals["B3"]
+        b4 = vals["B4"]
+        b3_calls = int(b3["llm_calls"])
+        b4_calls = int(b4["llm_calls"])
         llm_reduction = ((b3_calls - b4_calls) / b3_calls) if b3_calls else 0.0
 
-        print(f"\n{'='*80}")
-        print("PRIMARY COMPARISON: B4 (Memory+Diagnosis) vs B3 (Diagnosis)")
-        print(f"{'='*80}")
-        print(f"RR_task: B3={_get_val(b3,'rr_task',0.0):.1%}  B4={_get_val(b4,'rr_task',0.0):.1%}")
-        print(f"MTTR:    B3={_get_val(b3,'mttr_event',0.0):.1f} ms  B4={_get_val(b4,'mttr_event',0.0):.1f} ms")
-        print(f"RCO:     B3={_get_val(b3,'rco',0.0):.1%}  B4={_get_val(b4,'rco',0.0):.1%}")
-        print(f"LLM Calls: B3={b3_calls}  B4={b4_calls}  Reduction={llm_reduction:.1%}")
+        emit(_SEP_NL)
+        emit("PRIMARY COMPARISON: B4 (Memory+Diagnosis) vs B3 (Diagnosis)")
+        emit(_SEP)
+        emit(f"RR_task: B3={b3['rr_task']:.1%}  B4={b4['rr_task']:.1%}")
+        emit(f"MTTR:    B3={b3['mttr_event']:.1f} ms  B4={b4['mttr_event']:.1f} ms")
+        emit(f"RCO:     B3={b3['rco']:.1%}  B4={b4['rco']:.1%}")
+        emit(f"LLM Calls: B3={b3_calls}  B4={b4_calls}  Reduction={llm_reduction:.1%}")
 
     if ref in baselines and "B3" in baselines:
-        b2 = _get_row(df_raw, ref)
-        b3 = _get_row(df_raw, "B3")
-        
-        print(f"\n{'='*80}")
-        print(f"PRIMARY COMPARISON: B3 (Diagnosis-driven) vs {ref}")
-        print(f"{'='*80}")
+        b2 = vals[ref]
+        b3 = vals["B3"]
         
-        wcr_delta = (_get_val(b3, "wcr", 0.0) - _get_val(b2, "wcr", 0.0)) * 100
-        rr_task_delta = (_get_val(b3, "rr_task", 0.0) - _get_val(b2, "rr_task", 0.0)) * 100
-        rr_event_delta = (_get_val(b3, "rr_event", 0.0) - _get_val(b2, "rr_event", 0.0)) * 100
-        b2_mttr = float(_get_val(b2, "mttr_event", 0.0) or 0.0)
-        b3_mttr = float(_get_val(b3, "mttr_event", 0.0) or 0.0)
-        mttr_delta = ((b3_mttr - b2_mttr) / b2_mttr * 100) if b2_mttr > 0 else 0
-        rco_delta = (_get_val(b3, "rco", 0.0) - _get_val(b2, "rco", 0.0)) * 100
-        hir_delta = (_get_val(b3, "hir", 0.0) - _get_val(b2, "hir", 0.0)) * 100
+        emit(_SEP_NL)
+        emit(f"PRIMARY COMPARISON: B3 (Diagnosis-driven) vs {ref}")
+        emit(_SEP)
         
-        print(f"\nWorkflow Completion Rate (WCR):")
-        print(f"  {ref}: {_get_val(b2,'wcr',0.0):.1%}  ({int(_get_val(b2,'completed',0))}/{int(_get_val(b2,'total_tasks',0))})")
-        print(f"  B3: {_get_val(b3,'wcr',0.0):.1%}  ({int(_get_val(b3,'completed',0))}/{int(_get_val(b3,'total_tasks',0))})")
-        print(f"  Δ:  {wcr_delta:+.1f} pp {'✓ BETTER' if wcr_delta > 0 else '✗ WORSE' if wcr_delta < 0 else '= SAME'}")
+        deltas = {}
+        for key, title, lower_is_better, labels, detail in _REF_COMPARISON_METRICS:
+            ref_v = b2[key]
+            b3_v = b3[key]
+            emit(f"\n{title}:")
+            if key == "mttr_event":
+                # MTTR: absolute ms, relative Δ (only meaningful with a non-zero reference)
+                delta = ((b3_v - ref_v) / ref_v * 100) if ref_v > 0 else 0
+                emit(f"  {ref}: {ref_v:.1f} ms")
+                emit(f"  B3: {b3_v:.1f} ms")
+                if ref_v > 0:
+                    emit(f"  Δ:  {delta:+.1f}% {_fmt_delta(delta, labels, lower_is_better)}")
+            else:
+                delta = (b3_v - ref_v) * 100
+                emit(f"  {ref}: {ref_v:.1%}{detail(b2) if detail else ''}")
+                emit(f"  B3: {b3_v:.1%}{detail(b3) if detail else ''}")
+                emit(f"  Δ:  {delta:+.1f} pp {_fmt_delta(delta, labels, lower_is_better)}")
+            deltas[key] = delta
+        wcr_delta = deltas["wcr"]
+        rco_delta = deltas["rco"]
+        hir_delta = deltas["hir"]
         
-        print(f"\nRecovery Rate (RR_task):")
-        print(f"  {ref}: {_get_val(b2,'rr_task',0.0):.1%}")
-        print(f"  B3: {_get_val(b3,'rr_task',0.0):.1%}")
-        print(
-            f"  Δ:  {rr_task_delta:+.1f} pp "
-            f"{'✓ BETTER' if rr_task_delta > 0 else '✗ WORSE' if rr_task_delta < 0 else '= SAME'}"
-        )
-
-        print(f"\nRecovery Rate (RR_event):")
-        print(f"  {ref}: {_get_val(b2,'rr_event',0.0):.1%}")
-        print(f"  B3: {_get_val(b3,'rr_event',0.0):.1%}")
-        print(
-            f"  Δ:  {rr_event_delta:+.1f} pp "
-            f"{'✓ BETTER' if rr_event_delta > 0 else '✗ WORSE' if rr_event_delta < 0 else '= SAME'}"
-        )
-        
-        print(f"\nMean Time To Recovery (MTTR):")
-        print(f"  {ref}: {b2_mttr:.1f} ms")
-        print(f"  B3: {b3_mttr:.1f} ms")
-        if b2_mttr > 0:
-            print(f"  Δ:  {mttr_delta:+.1f}% {'✓ FASTER' if mttr_delta < 0 else '✗ SLOWER' if mttr_delta > 0 else '= SAME'}")
-        
-        print(f"\nRecovery Cost Overhead (RCO):")
-        b2_over = int(_get_val(b2, "actual_calls", 0) - _get_val(b2, "baseline_calls", 0))
-        b3_over = int(_get_val(b3, "actual_calls", 0) - _get_val(b3, "baseline_calls", 0))
-        print(f"  {ref}: {_get_val(b2,'rco',0.0):.1%}  (+{b2_over} calls)")
-        print(f"  B3: {_get_val(b3,'rco',0.0):.1%}  (+{b3_over} calls)")
-        print(f"  Δ:  {rco_delta:+.1f} pp {'✓ CHEAPER' if rco_delta < 0 else '✗ COSTLIER' if rco_delta > 0 else '= SAME'}")
-        
-        print(f"\nHuman Intervention Rate (HIR):")
-        print(f"  {ref}: {_get_val(b2,'hir',0.0):.1%}  ({int(_get_val(b2,'escalated',0))}/{int(_get_val(b2,'total_tasks',0))})")
-        print(f"  B3: {_get_val(b3,'hir',0.0):.1%}  ({int(_get_val(b3,'escalated',0))}/{int(_get_val(b3,'total_tasks',0))})")
-        print(f"  Δ:  {hir_delta:+.1f} pp {'✓ LESS' if hir_delta < 0 else '✗ MORE' if hir_delta > 0 else '= SAME'}")
-        
-        print(f"\n{'='*80}")
-        print("KEY INSIGHTS:")
-        print(f"{'='*80}")
+        emit(_SEP_NL)
+        emit("KEY INSIGHTS:")
+        emit(_SEP)
         
         if wcr_delta > 5:
-            print(f"  ✓ B3 significantly improves completion rate (+{wcr_delta:.1f} pp)")
+            emit(f"  ✓ B3 significantly improves completion rate (+{wcr_delta:.1f} pp)")
         elif wcr_delta < -5:
-            print(f"  ⚠ B3 degrades completion rate ({wcr_delta:.1f} pp) - review diagnosis logic")
+            emit(f"  ⚠ B3 degrades completion rate ({wcr_delta:.1f} pp) - review diagnosis logic")
         else:
-            print(f"  • B3 has similar completion rate (Δ {wcr_delta:+.1f} pp)")
+            emit(f"  • B3 has similar completion rate (Δ {wcr_delta:+.1f} pp)")
         
         if rco_delta < 0:
-            print(f"  ✓ B3 reduces recovery cost ({rco_delta:.1f} pp)")
+            emit(f"  ✓ B3 reduces recovery cost ({rco_delta:.1f} pp)")
         elif rco_delta > 5:
-            print(f"  ⚠ B3 increases recovery cost (+{rco_delta:.1f} pp)")
+            emit(f"  ⚠ B3 increases recovery cost (+{rco_delta:.1f} pp)")
         
         if hir_delta > 10:
-            print(f"  ⚠ B3 escalates much more often (+{hir_delta:.1f} pp) - possibly too conservative")
+            emit(f"  ⚠ B3 escalates much more often (+{hir_delta:.1f} pp) - possibly too conservative")
         
-        print(f"{'='*80}\n")
+        emit(_SEP + "\n")
     
     # 次要分析：B2 vs B1
     if "B1" in baselines and "B2" in baselines:
-        b1 = _get_row(df_raw, "B1")
-        b2 = _get_row(df_raw, "B2")
+        b1 = vals["B1"]
+        b2 = vals["B2"]
         
-        print(f"\nSECONDARY: B2 vs B1 (Rule-based vs Naive-Retry)")
-        print(
-            f"  WCR: {_get_val(b2,'wcr',0.0):.1%} vs {_get_val(b1,'wcr',0.0):.1%}"
-            f"  (Δ {(_get_val(b2,'wcr',0.0)-_get_val(b1,'wcr',0.0))*100:+.1f} pp)"
+        emit(f"\nSECONDARY: B2 vs B1 (Rule-based vs Naive-Retry)")
+        emit(
+            f"  WCR: {b2['wcr']:.1%} vs {b1['wcr']:.1%}"
+            f"  (Δ {(b2['wcr']-b1['wcr'])*100:+.1f} pp)"
         )
-        print(
-            f"  RCO: {_get_val(b2,'rco',0.0):.1%} vs {_get_val(b1,'rco',0.0):.1%}"
-            f"  (Δ {(_get_val(b2,'rco',0.0)-_get_val(b1,'rco',0.0))*100:+.1f} pp)"
+        emit(
+            f"  RCO: {b2['rco']:.1%} vs {b1['rco']:.1%}"
+            f"  (Δ {(b2['rco']-b1['rco'])*100:+.1f} pp)"
         )
     
     # B0 基线
     if "B0" in baselines:
-        b0 = _get_row(df_raw, "B0")
-        print(f"\nB0 (No-Recovery) Baseline:")
-        print(f"  WCR: {_get_val(b0,'wcr',0.0):.1%} - lower bound without recovery")
+        b0 = vals["B0"]
+        emit(f"\nB0 (No-Recovery) Baseline:")
+        emit(f"  WCR: {b0['wcr']:.1%} - lower bound without recovery")
 
     # Quick "best of" summary for scanning.
     try:
-        if pd is not None:
-            df = df_raw.copy()
-            best = {
-                "WCR": df.loc[df["wcr"].idxmax(), ["baseline", "wcr"]].to_dict(),
-                "RR_task": df.loc[df["rr_task"].idxmax(), ["baseline", "rr_task"]].to_dict(),
-                "HIR (lowest)": df.loc[df["hir"].idxmin(), ["baseline", "hir"]].to_dict(),
-                "MTTR (lowest)": df.loc[df["mttr_event"].idxmin(), ["baseline", "mttr_event"]].to_dict(),
-                "RCO (lowest)": df.loc[df["rco"].idxmin(), ["baseline", "rco"]].to_dict(),
-                "CPS (lowest)": df.loc[df["cps"].idxmin(), ["baseline", "cps"]].to_dict(),
-            }
-            print("\n" + "="*80)
-            print("BEST-OF SUMMARY")
-            print("="*80)
-            print(f"  WCR: {best['WCR']['baseline']}={best['WCR']['wcr']:.1%}")
-            print(f"  RR_task: {best['RR_task']['baseline']}={best['RR_task']['rr_task']:.1%}")
-            print(f"  HIR(low): {best['HIR (lowest)']['baseline']}={best['HIR (lowest)']['hir']:.1%}")
-            print(f"  MTTR(low): {best['MTTR (lowest)']['baseline']}={best['MTTR (lowest)']['mttr_event']:.1f} ms")
-            print(f"  RCO(low): {best['RCO (lowest)']['baseline']}={best['RCO (lowest)']['rco']:.1%}")
-            print(f"  CPS(low): {best['CPS (lowest)']['baseline']}={best['CPS (lowest)']['cps']:.2f}")
-        else:
-            rows = list(df_raw)
-            def _best_max(k): return max(rows, key=lambda r: r.get(k, 0.0))
-            def _best_min(k): return min(rows, key=lambda r: r.get(k, 0.0))
-            w = _best_max("wcr"); rr = _best_max("rr_task"); hir = _best_min("hir")
-            mttr = _best_min("mttr_event"); rco = _best_min("rco"); cps = _best_min("cps")
-            print("\n" + "="*80)
-            print("BEST-OF SUMMARY")
-            print("="*80)
-            print(f"  WCR: {w['baseline']}={w.get('wcr',0.0):.1%}")
-            print(f"  RR_task: {rr['baseline']}={rr.get('rr_task',0.0):.1%}")
-            print(f"  HIR(low): {hir['baseline']}={hir.get('hir',0.0):.1%}")
-            print(f"  MTTR(low): {mttr['baseline']}={mttr.get('mttr_event',0.0):.1f} ms")
-            print(f"  RCO(low): {rco['baseline']}={rco.get('rco',0.0):.1%}")
-            print(f"  CPS(low): {cps['baseline']}={cps.get('cps',0.0):.2f}")
+        # One pass over the rows for all six metrics; strict comparisons keep the
+        # first row on ties, like max()/min().
+        best = [None] * len(_BEST_OF)
+        for r in rows.values():
+            for i, (_, key, higher_is_better, _) in enumerate(_BEST_OF):
+                v = r.get(key, 0.0)
+                cur = best[i]
+                if cur is None or (v > cur[1] if higher_is_better else v < cur[1]):
+                    best[i] = (r["baseline"], v)
+        if rows:
+            emit(_SEP_NL)
+            emit("BEST-OF SUMMARY")
+            emit(_SEP)
+            for (label, _, _, template), (baseline, v) in zip(_BEST_OF, best):
+                emit(f"  {label}: {baseline}={template.format(v)}")
     except Exception:
         pass
 
     if details:
-        print("\n" + "="*80)
-        print("ESCALATION BREAKDOWN (top reasons per strategy)")
-        print("="*80)
+        emit(_SEP_NL)
+        emit("ESCALATION BREAKDOWN (top reasons per strategy)")
+        emit(_SEP)
         for b in baselines:
-            row = _get_row(df_raw, b) if pd is not None else next((r for r in df_raw if r["baseline"] == b), None)
+            row = rows[b]
             reasons = _get_val(row, "final_reason_counts", {}) or {}
             if not isinstance(reasons, dict):
                 reasons = {}
-            top = sorted(reasons.items(), key=lambda kv: (-kv[1], kv[0]))[:5]
+            top = heapq.nsmallest(5, reasons.items(), key=lambda kv: (-kv[1], kv[0]))
             top_str = ", ".join(f"{k}={v}" for k, v in top) if top else "-"
-            print(f"  {b}: {top_str}")
+            emit(f"  {b}: {top_str}")
     
-    print("="*80 + "\n")
+    emit(_SEP + "\n")
+    sys.stdout.write("\n".join(lines) + "\n")
 
 
 if __name__ == "__main__":
@@ -327,73 +408,46 @@ if __name__ == "__main__":
     parser.add_argument("--b2", default="traces_B2.jsonl")
     parser.add_argument("--b3", default="traces_B3.jsonl")
     parser.add_argument("--b4", default="traces_B4.jsonl")
+    parser.add_argument(
+        "--baselines",
+        nargs="+",
+        default=["B0", "B1", "B2", "B3", "B4"],
+        help="Baselines to include (paths from --bN, else traces_<name>.jsonl)",
+    )
     parser.add_argument("--wide", action="store_true", help="Show more columns")
     parser.add_argument("--ref", default=None, help="Reference baseline for Δ columns (e.g., B2)")
     parser.add_argument("--details", action="store_true", help="Print escalation breakdown")
     parser.add_argument("--csv", default="leaderboard.csv", help="CSV output path")
+    parser.add_argument("--executor", choices=["process", "thread"], default="process",
+                        help="Worker kind when traces total >= 8 MiB; 'thread' skips process start-up")
     args = parser.parse_args()
 
     if args.traces:
         traces_paths = {_infer_label(path): path for path in args.traces}
     else:
         traces_paths = {
-            "B0": args.b0,
-            "B1": args.b1,
-            "B2": args.b2,
-            "B3": args.b3,
-            "B4": args.b4,
+            name: getattr(args, name.lower(), None) or f"traces_{name}.jsonl"
+            for name in args.baselines
         }
     
-    print("\n" + "="*80)
-    print("AWRR BASELINE LEADERBOARD (Phase 4)")
-    print("="*80)
+    sys.stdout.write(f"{_SEP_NL}\nAWRR BASELINE LEADERBOARD (Phase 4)\n{_SEP}\n")
     
-    display_df, raw_df = generate_leaderboard(traces_paths, wide=args.wide, ref=args.ref)
-    
-    if pd is None:
-        has_results = bool(raw_df)
-    else:
-        has_results = not raw_df.empty
-
-    if has_results:
-        print("\n")
-        if pd is None:
-            # Minimal table when pandas is unavailable.
-            headers = ["Strategy", "WCR", "RR_task", "HIR", "MTTR(ms)", "RCO", "CPS", "LLM_Calls"]
-            print(" ".join(f"{h:>12s}" for h in headers))
-            for row in raw_df:
-                print(
-                    f"{row['baseline']:>12s}"
-                    f"{row.get('wcr', 0.0):>12.2%}"
-                    f"{row.get('rr_task', 0.0):>12.2%}"
-                    f"{row.get('hir', 0.0):>12.2%}"
-                    f"{row.get('mttr_event', 0.0):>12.1f}"
-                    f"{row.get('rco', 0.0):>12.2%}"
-                    f"{row.get('cps', 0.0):>12.2f}"
-                    f"{int(row.get('llm_calls', 0)):>12d}"
-                )
-        else:
-            print(display_df.to_string(index=False))
-        print("\n")
+    display, results = generate_leaderboard(
+        sorted(traces_paths.items()), wide=args.wide, ref=args.ref, executor=args.executor
+    )
+
+    if results:
+        sys.stdout.write("\n\n" + _format_table(display) + "\n\n\n")
         
-        print_analysis(raw_df, ref=args.ref or "B2", details=args.details)
+        print_analysis(results, ref=args.ref or "B2", details=args.details)
         
         # 保存为 CSV
-        if pd is None:
-            import csv
-            scalar_rows = []
-            for r in raw_df:
-                scalar_rows.append(r.get("summary") or r)
-            with open(args.csv, "w", newline="") as csvfile:
-                writer = csv.DictWriter(csvfile, fieldnames=scalar_rows[0].keys())
-                writer.writeheader()
-                writer.writerows(scalar_rows)
-        else:
-            # Drop nested objects for CSV readability
-            summary_rows = []
-            for _, row in raw_df.iterrows():
-                summary_rows.append(row.get("summary") or row.to_dict())
-            pd.DataFrame(summary_rows).to_csv(args.csv, index=False)
+        # Drop nested objects for CSV readability
+        scalar_rows = [r.get("summary") or r for r in results]
+        with open(args.csv, "w", newline="") as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=scalar_rows[0].keys())
+            writer.writeheader()
+            writer.writerows(scalar_rows)
         print(f"Detailed results saved to: {args.csv}")
     else:
         print("No results to display")
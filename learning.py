@@ -1,31 +1,42 @@
 from __future__ import annotations
 
+import heapq
 import json
 import math
 import os
-import re
+import string
+from collections import Counter
 from dataclasses import dataclass, field
 from typing import Dict, List, Optional, Tuple
 
 from state import StepContext, StepResult
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Byte table mapping everything outside [A-Za-z0-9_] to a space, so the tokenizer is a
+# C-level translate + split. Non-ASCII text is first encoded with "replace" ("?"), which
+# keeps it a separator exactly like the ASCII-only regex class it stands in for.
+_WORD_BYTES = frozenset((string.ascii_letters + string.digits + "_").encode())
+_TOKEN_TABLE = bytes(c if c in _WORD_BYTES else 0x20 for c in range(256))
+
 
 def _extract_keywords(text: str, k: int = 5) -> List[str]:
     """
     Extract top-K lightweight keywords from error text.
     Uses simple token frequency; avoids heavy NLP deps.
     """
-    tokens = re.findall(r"[A-Za-z0-9_]+", text.lower())
-    freq: Dict[str, int] = {}
-    for t in tokens:
-        if len(t) <= 2:
-            continue
-        freq[t] = freq.get(t, 0) + 1
-    top = sorted(freq.items(), key=lambda x: (-x[1], x[0]))[:k]
+    tokens = text.lower().encode("ascii", "replace").translate(_TOKEN_TABLE).decode("ascii").split()
+    freq = Counter(t for t in tokens if len(t) > 2)
+    # Heap top-k, O(n log k). Not most_common(): ties must stay alphabetical, not first-seen.
+    top = heapq.nsmallest(k, freq.items(), key=lambda x: (-x[1], x[0]))
     return [w for w, _ in top]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class FaultSignature:
     """
     Canonical signature for a failure event, used for kNN-style lookup.
@@ -36,6 +47,11 @@ class FaultSignature:
     step_name: str
     topK_error_keywords: Tuple[str, ...]
     state_hash_prefix: str
+    # keyword_set() cache; derived from topK_error_keywords, so excluded from eq/hash/repr
+    _kw_set: frozenset = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, "_kw_set", frozenset(self.topK_error_keywords))
 
     @staticmethod
     def from_failure(
@@ -60,8 +76,8 @@ class FaultSignature:
         kw = ",".join(self.topK_error_keywords)
         return f"{self.tool_name}|{self.error_type}|{self.step_name}|{self.state_hash_prefix}|{kw}"
 
-    def keyword_set(self) -> set[str]:
-        return set(self.topK_error_keywords)
+    def keyword_set(self) -> frozenset[str]:
+        return self._kw_set
 
     def to_dict(self) -> dict:
         return {
@@ -73,7 +89,7 @@ class FaultSignature:
         }
 
 
-@dataclass
+@dataclass(slots=True)
 class MemoryEntry:
     action: str
     stats: Dict[str, int] = field(default_factory=lambda: {"success": 0, "total": 0})
@@ -91,18 +107,78 @@ class MemoryBank:
     Supports rule-similarity scoring with persistence.
     """
 
-    def __init__(self, path: Optional[str] = None):
+    def __init__(self, path: Optional[str] = None, autosave: bool = True):
+        """
+        autosave=False defers persistence: upserts only mark the bank dirty and the
+        caller writes it out with flush() (e.g. once per batch instead of per upsert).
+        """
         self.path = path
+        self._autosave = autosave
+        self._dirty = False
         self.entries: Dict[str, dict] = {}
         if path and os.path.exists(path):
-            with open(path, "r") as f:
-                self.entries = json.load(f)
+            with open(path, "rb") as f:
+                data = f.read()
+            self.entries = orjson.loads(data) if orjson is not None else json.loads(data)
+        # Inverted index over the stored signatures (rebuilt on load, not persisted):
+        # field value / keyword -> keys of the entries carrying it. Entries outside
+        # every bucket a query hits share nothing with it and score exactly 0.0.
+        self._by_tool: Dict[Optional[str], set[str]] = {}
+        self._by_error: Dict[Optional[str], set[str]] = {}
+        self._by_step: Dict[Optional[str], set[str]] = {}
+        self._by_prefix: Dict[Optional[str], set[str]] = {}
+        self._by_kw: Dict[str, set[str]] = {}
+        self._order: Dict[str, int] = {}  # insertion position, for query's tie-break
+        self._kw_sets: Dict[str, frozenset] = {}  # stored keyword sets for the Jaccard term
+        for key, entry in self.entries.items():
+            self._index_entry(key, entry)
+
+    def _index_entry(self, key: str, entry: dict):
+        stored = entry["signature"]
+        self._order[key] = len(self._order)
+        self._by_tool.setdefault(stored.get("tool_name"), set()).add(key)
+        self._by_error.setdefault(stored.get("error_type"), set()).add(key)
+        self._by_step.setdefault(stored.get("step_name"), set()).add(key)
+        self._by_prefix.setdefault(stored.get("state_hash_prefix"), set()).add(key)
+        kw_set = self._kw_sets[key] = frozenset(stored.get("topK_error_keywords", []))
+        for kw in kw_set:
+            self._by_kw.setdefault(kw, set()).add(key)
+
+    def _candidates(self, signature: FaultSignature) -> set[str]:
+        empty: set[str] = set()
+        candidates = (
+            self._by_tool.get(signature.tool_name, empty)
+            | self._by_error.get(signature.error_type, empty)
+            | self._by_step.get(signature.step_name, empty)
+            | self._by_prefix.get(signature.state_hash_prefix, empty)
+        )
+        for kw in signature.topK_error_keywords:
+            candidates |= self._by_kw.get(kw, empty)
+        return candidates
 
     def save(self):
         if not self.path:
             return
-        with open(self.path, "w") as f:
-            json.dump(self.entries, f, indent=2)
+        if orjson is not None:
+            data = orjson.dumps(self.entries, option=orjson.OPT_INDENT_2)
+        else:
+            data = json.dumps(self.entries, ensure_ascii=False, indent=2).encode()
+        # Write-then-rename: a crash mid-write leaves the previous bank intact.
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self._dirty = False
+
+    def flush(self):
+        """Write pending upserts (no-op when nothing changed since the last save)."""
+        if self._dirty:
+            self.save()
 
     def upsert(self, signature: FaultSignature, best_action: str, success: bool = True):
         key = signature.to_key()
@@ -120,6 +196,7 @@ class MemoryBank:
                 "stats": {"success": 0, "total": 0},
                 "examples": [],
             }
+            self._index_entry(key, entry)
         entry["action"] = best_action
         entry["stats"]["total"] += 1
         if success:
@@ -131,7 +208,9 @@ class MemoryBank:
         if len(entry["examples"]) < 5:
             entry["examples"].append(example)
         self.entries[key] = entry
-        self.save()
+        self._dirty = True
+        if self._autosave:
+            self.save()
 
     def query(self, signature: FaultSignature) -> Tuple[Optional[str], float, Optional[str]]:
         """
@@ -143,9 +222,36 @@ class MemoryBank:
         best_key = None
         best_score = -1.0
         best_action = None
-        for key, entry in self.entries.items():
-            stored_sig = entry["signature"]
-            score = self._similarity(signature, stored_sig)
+        candidates = self._candidates(signature)
+        if candidates:
+            # Same result as scoring every entry: non-candidates score 0.0, below any
+            # candidate, and visiting candidates in insertion order keeps the
+            # first-best-wins tie-break.
+            keys = sorted(candidates, key=self._order.__getitem__)
+        else:
+            keys = self.entries  # every entry scores 0.0; full scan picks the first
+        sig_kw = signature.keyword_set()
+        for key in keys:
+            entry = self.entries[key]
+            stored = entry["signature"]
+            # Weighted similarity: tool 0.3, error 0.3, step 0.2, keyword Jaccard 0.2,
+            # state prefix 0.1. Only a strictly higher score replaces the best, so an
+            # entry whose upper bound cannot beat it skips the Jaccard/prefix terms.
+            score = 0.0
+            if signature.tool_name == stored.get("tool_name"):
+                score += 0.3
+            if signature.error_type == stored.get("error_type"):
+                score += 0.3
+            if signature.step_name == stored.get("step_name"):
+                score += 0.2
+            if score + 0.2 + 0.1 <= best_score:
+                continue
+            stored_kw = self._kw_sets[key]
+            inter = len(sig_kw & stored_kw)
+            union = len(sig_kw) + len(stored_kw) - inter or 1
+            score += 0.2 * (inter / union)
+            if signature.state_hash_prefix == stored.get("state_hash_prefix"):
+                score += 0.1
             if score > best_score:
                 best_score = score
                 best_key = key
@@ -160,22 +266,3 @@ class MemoryBank:
         )
         confidence = max(0.0, min(1.0, best_score * 0.7 + success_rate * 0.3))
         return best_action, confidence, best_key
-
-    @staticmethod
-    def _similarity(sig: FaultSignature, stored: dict) -> float:
-        score = 0.0
-        if sig.tool_name == stored.get("tool_name"):
-            score += 0.3
-        if sig.error_type == stored.get("error_type"):
-            score += 0.3
-        if sig.step_name == stored.get("step_name"):
-            score += 0.2
-        jaccard = 0.0
-        stored_kw = set(stored.get("topK_error_keywords", []))
-        inter = len(sig.keyword_set().intersection(stored_kw))
-        union = len(sig.keyword_set().union(stored_kw)) or 1
-        jaccard = inter / union
-        score += 0.2 * jaccard
-        if sig.state_hash_prefix == stored.get("state_hash_prefix"):
-            score += 0.1
-        return score
@@ -1,12 +1,20 @@
 import argparse
+import heapq
 import json
 from collections import Counter
 from collections import defaultdict
-from typing import Tuple
+from dataclasses import dataclass, field, fields
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 FINAL_OUTCOMES = {"success", "escalated", "failed"}
 RECOVERY_ACTIONS = {"retry", "rollback", "rollback_then_retry"}
 TOOL_EVENT_TYPES = {"tool_call"}
+LLM_DIAGNOSIS_SOURCES = {"diagnosis", "llm"}
+UNAUTHORIZED_ERRORS = {"AuthDenied", "PolicyRejected"}
 
 
 def _infer_final_outcome(task_events: list[dict], last_step_idx: int) -> str:
@@ -25,6 +33,17 @@ def _infer_final_outcome(task_events: list[dict], last_step_idx: int) -> str:
         return "success"
     return "failed"
 
+def _sort_by_ts(task_events: list[dict]) -> list[dict]:
+    """按 ts_ms 稳定排序（缺失视为 0）
+
+    轨迹按时间追加，任务内通常已有序：只取一次时间戳检查单调性，有序时原样返回；
+    乱序时按取好的时间戳下标排序，不再每次比较都调用 lambda。
+    """
+    ts = [e.get("ts_ms", 0) for e in task_events]
+    if all(a <= b for a, b in zip(ts, ts[1:])):
+        return task_events
+    return [task_events[i] for i in sorted(range(len(ts)), key=ts.__getitem__)]
+
 def _normalize_action(action: str | None) -> str | None:
     if not action:
         return None
@@ -32,21 +51,6 @@ def _normalize_action(action: str | None) -> str | None:
         return action.split(":", 1)[1]
     return action
 
-def _task_call_counts(task_events) -> Tuple[int, int]:
-    actual_calls = 0
-    seen_steps = set()
-    base_calls = 0
-    for e in task_events:
-        if e.get("event_type", "tool_call") != "tool_call":
-            continue
-        actual_calls += 1
-        step_idx = e.get("step_idx", 0)
-        if step_idx not in seen_steps:
-            seen_steps.add(step_idx)
-            base_calls += 1
-    return base_calls, actual_calls
-
-
 def _mttr_delta_ms(task_events, err_i: int, ok_i: int) -> float:
     err_ts = task_events[err_i].get("ts_ms")
     ok_ts = task_events[ok_i].get("ts_ms")
@@ -58,18 +62,6 @@ def _mttr_delta_ms(task_events, err_i: int, ok_i: int) -> float:
         total += float(e.get("latency_ms", 0) or 0)
     return total
 
-def _is_tool_error_event(e: dict) -> bool:
-    return (
-        e.get("status") == "error"
-        and e.get("event_type", "tool_call") in TOOL_EVENT_TYPES
-    )
-
-def _first_tool_error_event(task_events: list[dict]) -> dict | None:
-    for e in task_events:
-        if _is_tool_error_event(e):
-            return e
-    return None
-
 def _scalar_summary(metrics: dict) -> dict:
     summary = {}
     for k, v in metrics.items():
@@ -77,232 +69,440 @@ def _scalar_summary(metrics: dict) -> dict:
             summary[k] = v
     return summary
 
-def compute_metrics(traces_path: str, baseline_name: str | None = None) -> dict:
-    """
-    从轨迹计算所有指标
-
-    指标定义：
-    - WCR: final_outcome == success
-    - HIR: final_outcome == escalated 的任务比例
-    - RR_task: 出现过 error 的任务中，最终成功的比例
-    - RR_event: error 事件后系统能继续推进的比例
-    - MTTR_event: error 到首次同 step ok 的平均时间差
-    - CPT/CPS: 单任务/成功任务平均 tool_calls
-    - RCO: max(actual - baseline, 0) / baseline
-    - UAR: AuthDenied/PolicyRejected 的任务比例
-    """
+def _parse_jsonl(data: bytes) -> list[dict]:
+    loads = orjson.loads if orjson is not None else json.loads
+    return [loads(line) for line in data.splitlines() if line.strip()]
 
-    events: list[dict] = []
-    with open(traces_path, "r") as f:
-        for line in f:
-            events.append(json.loads(line))
 
-    if not events:
-        return {}
+def load_events(traces_path: str) -> list[dict]:
+    """读取 JSONL 轨迹（装了 orjson 时直接解析 bytes，否则回退到 json.loads）
 
-    tasks: dict[str, list[dict]] = defaultdict(list)
-    for event in events:
-        tasks[event["task_id"]].append(event)
+    整个文件一次读入再按行切分，跳过空行。
+    """
+    with open(traces_path, "rb") as f:
+        return _parse_jsonl(f.read())
 
-    total_tasks = len(tasks)
-    completed_tasks = 0
-    escalated_tasks = 0
 
-    error_tasks = 0
-    recovered_tasks = 0
+@dataclass
+class IncrementalMetrics:
+    """compute_metrics 的增量累加器：按任务喂入事件，计数随写入同步更新
 
-    total_error_events = 0
-    recovered_error_events = 0
-    mttr_event_times: list[float] = []
-    srr_eligible_tasks = 0
-    srr_pass_tasks = 0
+    learning_eval 每批运行完就把该批任务的事件喂进来，最终状态可落盘（to_dict），
+    之后 `metrics.py --prebuilt` 直接从该状态出指标，不必重新读取、解析整份轨迹。
+    同一任务的事件必须一次性喂入（add_task / add_events 以整任务为单位聚合）。
+    """
 
-    tool_calls_total = sum(
-        1 for event in events if event.get("event_type", "tool_call") == "tool_call"
+    total_tasks: int = 0
+    completed: int = 0
+    escalated: int = 0
+    error_tasks: int = 0
+    recovered_tasks: int = 0
+    total_error_events: int = 0
+    recovered_error_events: int = 0
+    srr_eligible: int = 0
+    srr_pass: int = 0
+    tool_calls_total: int = 0
+    llm_calls: int = 0
+    baseline_calls: int = 0
+    overhead_calls: int = 0
+    auth_issue_tasks: int = 0
+    mttr_event_times: list[float] = field(default_factory=list)
+    final_reason_counts: Counter[str] = field(default_factory=Counter)
+    recovery_action_counts: Counter[str] = field(default_factory=Counter)
+    # Per-task: classify by the first error type observed.
+    first_error_type_task_counts: Counter[str] = field(default_factory=Counter)
+    first_error_type_outcomes: dict[str, Counter[str]] = field(
+        default_factory=lambda: defaultdict(Counter)
     )
-    llm_calls = sum(
-        1
-        for event in events
-        if (event.get("diagnosis") or {}).get("source") in ["diagnosis", "llm"]
+    # Per-event: error-type level recovery breakdown.
+    error_type_event_counts: Counter[str] = field(default_factory=Counter)
+    recovered_error_type_event_counts: Counter[str] = field(default_factory=Counter)
+    mttr_event_times_by_error_type: dict[str, list[float]] = field(
+        default_factory=lambda: defaultdict(list)
     )
 
-    rco_base_calls_total = 0
-    rco_overhead_calls_total = 0
-
-    tasks_with_auth_issues = 0
-    final_reason_counts: Counter[str] = Counter()
-    recovery_action_counts: Counter[str] = Counter()
-
-    # Per-task: classify by the first error type observed.
-    first_error_type_task_counts: Counter[str] = Counter()
-    first_error_type_outcomes: dict[str, Counter[str]] = defaultdict(Counter)
-
-    # Per-event: error-type level recovery breakdown.
-    error_type_event_counts: Counter[str] = Counter()
-    recovered_error_type_event_counts: Counter[str] = Counter()
-    mttr_event_times_by_error_type: dict[str, list[float]] = defaultdict(list)
+    def add_events(self, events: list[dict]):
+        """按 task_id 分组后逐任务累加（保持任务首次出现的顺序）"""
+        tasks: dict[str, list[dict]] = defaultdict(list)
+        for event in events:
+            tasks[event["task_id"]].append(event)
+        for task_events in tasks.values():
+            self.add_task(task_events)
+
+    def add_task(self, task_events: list[dict]):
+        """累加单个任务的全部事件"""
+        self.total_tasks += 1
+        task_events = _sort_by_ts(task_events)
+
+        # 单次遍历：同时累计调用数（含 RCO 的去重 step）、最大 step、final 事件、错误事件、
+        # 首个错误类型与授权问题；需要向后查找恢复的错误事件只记下标，留给下面第二个循环
+        last_step_idx = None
+        final_event = None
+        actual_calls_task = 0
+        seen_steps = set()
+        task_error_events = 0
+        first_error_type = None
+        has_auth_error = False
+        recovery_candidates: list[tuple[int, str]] = []
+        for idx, event in enumerate(task_events):
+            step_idx = event.get("step_idx", 0)
+            if last_step_idx is None or step_idx > last_step_idx:
+                last_step_idx = step_idx
+            if (event.get("diagnosis") or {}).get("source") in LLM_DIAGNOSIS_SOURCES:
+                self.llm_calls += 1
+            event_type = event.get("event_type", "tool_call")
+            if event_type == "tool_call":
+                actual_calls_task += 1
+                seen_steps.add(step_idx)
+            elif event_type == "final":
+                final_event = event
+            if event.get("status") != "error":
+                continue
+            is_tool_event = event_type in TOOL_EVENT_TYPES
+            error_type = str(event.get("error_type") or "Unknown")
+            if is_tool_event:
+                task_error_events += 1
+                self.error_type_event_counts[error_type] += 1
+                if first_error_type is None:
+                    first_error_type = error_type
+                if event.get("error_type") in UNAUTHORIZED_ERRORS:
+                    has_auth_error = True
+
+            recovery_action = _normalize_action(event.get("recovery_action"))
+            if recovery_action:
+                self.recovery_action_counts[recovery_action] += 1
+            if recovery_action in RECOVERY_ACTIONS and is_tool_event:
+                recovery_candidates.append((idx, error_type))
 
-    for task_events in tasks.values():
-        task_events = sorted(task_events, key=lambda e: e.get("ts_ms", 0))
-        last_step_idx = max(e.get("step_idx", 0) for e in task_events)
         final_outcome = _infer_final_outcome(task_events, last_step_idx)
-
-        base_calls_task, actual_calls_task = _task_call_counts(task_events)
-        rco_base_calls_total += base_calls_task
-        rco_overhead_calls_total += max(actual_calls_task - base_calls_task, 0)
+        self.tool_calls_total += actual_calls_task
+        base_calls_task = len(seen_steps)
+        self.baseline_calls += base_calls_task
+        self.overhead_calls += max(actual_calls_task - base_calls_task, 0)
 
         if final_outcome == "success":
-            completed_tasks += 1
+            self.completed += 1
 
         if final_outcome == "escalated":
-            escalated_tasks += 1
+            self.escalated += 1
 
-        final_event = next(
-            (e for e in reversed(task_events) if e.get("event_type") == "final"),
-            None
-        )
         if final_event and final_event.get("srr_eligible") is True:
-            srr_eligible_tasks += 1
+            self.srr_eligible += 1
             if final_event.get("srr_pass") is True:
-                srr_pass_tasks += 1
+                self.srr_pass += 1
         if final_outcome == "escalated":
-            final_reason_counts[str(final_event.get("final_reason") or "unknown")] += 1
-
-        error_events = [e for e in task_events if _is_tool_error_event(e)]
-        if error_events:
-            error_tasks += 1
+            self.final_reason_counts[str(final_event.get("final_reason") or "unknown")] += 1
+
+        # 向后找同 step 的首个 ok 工具调用；下标 j 直接用于 MTTR，不再 .index() 回查
+        n_events = len(task_events)
+        for idx, error_type in recovery_candidates:
+            event = task_events[idx]
+            error_step = event.get("step_idx", 0)
+            for j in range(idx + 1, n_events):
+                later_event = task_events[j]
+                if (
+                    later_event.get("status") == "ok"
+                    and later_event.get("step_idx", 0) == error_step
+                    and later_event.get("event_type", "tool_call") in TOOL_EVENT_TYPES
+                ):
+                    self.recovered_error_events += 1
+                    self.recovered_error_type_event_counts[error_type] += 1
+                    if event.get("ts_ms") is not None and later_event.get("ts_ms") is not None:
+                        dt = _mttr_delta_ms(task_events, idx, j)
+                        self.mttr_event_times.append(dt)
+                        self.mttr_event_times_by_error_type[error_type].append(dt)
+                    break
+
+        if task_error_events:
+            self.error_tasks += 1
             if final_outcome == "success":
-                recovered_tasks += 1
+                self.recovered_tasks += 1
+        if first_error_type is not None:
+            self.first_error_type_task_counts[first_error_type] += 1
+            self.first_error_type_outcomes[first_error_type][final_outcome] += 1
+        self.total_error_events += task_error_events
+        if has_auth_error:
+            self.auth_issue_tasks += 1
+
+    def merge(self, other: "IncrementalMetrics"):
+        """并入另一段任务的累加结果（other 的任务排在本累加器已有任务之后）
+
+        计数相加；Counter 的新键与 MTTR 列表按 other 的顺序追加，结果与顺序累加一致。
+        """
+        for f in fields(self):
+            mine = getattr(self, f.name)
+            theirs = getattr(other, f.name)
+            if f.name == "first_error_type_outcomes":
+                for k, v in theirs.items():
+                    mine[k].update(v)
+            elif f.name == "mttr_event_times_by_error_type":
+                for k, v in theirs.items():
+                    mine[k].extend(v)
+            elif isinstance(mine, Counter):
+                mine.update(theirs)
+            elif isinstance(mine, list):
+                mine.extend(theirs)
+            else:
+                setattr(self, f.name, mine + theirs)
+
+    def to_dict(self) -> dict:
+        """可 JSON 序列化的累加状态（Counter/defaultdict 转为普通 dict）"""
+        state = {}
+        for f in fields(self):
+            value = getattr(self, f.name)
+            if f.name == "first_error_type_outcomes":
+                value = {k: dict(v) for k, v in value.items()}
+            elif isinstance(value, dict):
+                value = dict(value)
+            state[f.name] = value
+        return state
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "IncrementalMetrics":
+        acc = cls()
+        for f in fields(cls):
+            if f.name not in state:
+                continue
+            value = state[f.name]
+            current = getattr(acc, f.name)
+            if f.name == "first_error_type_outcomes":
+                current.update((k, Counter(v)) for k, v in value.items())
+            elif isinstance(current, dict):
+                current.update(value)
+            else:
+                setattr(acc, f.name, value)
+        return acc
+
+    def result(self, baseline_name: str | None = None) -> dict:
+        """按 compute_metrics 的口径出指标；没有任务时返回 {}"""
+        total_tasks = self.total_tasks
+        if not total_tasks:
+            return {}
+        completed_tasks = self.completed
+        escalated_tasks = self.escalated
+        error_tasks = self.error_tasks
+        recovered_tasks = self.recovered_tasks
+        total_error_events = self.total_error_events
+        recovered_error_events = self.recovered_error_events
+        mttr_event_times = self.mttr_event_times
+        tool_calls_total = self.tool_calls_total
+        srr_eligible_tasks = self.srr_eligible
+        srr_pass_tasks = self.srr_pass
+
+        wcr = completed_tasks / total_tasks if total_tasks else 0.0
+        rr_task = recovered_tasks / error_tasks if error_tasks else 0.0
+        rr_event = (
+            recovered_error_events / total_error_events if total_error_events else 0.0
+        )
+        mttr_event = sum(mttr_event_times) / len(mttr_event_times) if mttr_event_times else 0.0
+
+        rco = (self.overhead_calls / self.baseline_calls) if self.baseline_calls else 0.0
+
+        cpt = tool_calls_total / total_tasks if total_tasks else 0.0
+        cps = tool_calls_total / max(completed_tasks, 1)
+
+        hir = escalated_tasks / total_tasks if total_tasks else 0.0
+        uar = self.auth_issue_tasks / total_tasks if total_tasks else 0.0
+        srr = srr_pass_tasks / srr_eligible_tasks if srr_eligible_tasks else 0.0
+
+        # Build breakdown dicts for inspection / leaderboard details.
+        by_first_error_type = {}
+        for et, count in self.first_error_type_task_counts.items():
+            outs = self.first_error_type_outcomes.get(et, Counter())
+            succ = outs.get("success", 0)
+            esc = outs.get("escalated", 0)
+            fail = outs.get("failed", 0)
+            by_first_error_type[et] = {
+                "tasks": int(count),
+                "success": int(succ),
+                "escalated": int(esc),
+                "failed": int(fail),
+                "rr_task": (succ / count) if count else 0.0,
+                "hir": (esc / count) if count else 0.0,
+            }
+
+        by_error_type_event = {}
+        for et, cnt in self.error_type_event_counts.items():
+            rec = self.recovered_error_type_event_counts.get(et, 0)
+            mttrs = self.mttr_event_times_by_error_type.get(et, [])
+            by_error_type_event[et] = {
+                "error_events": int(cnt),
+                "recovered_events": int(rec),
+                "rr_event": (rec / cnt) if cnt else 0.0,
+                "mttr_event": (sum(mttrs) / len(mttrs)) if mttrs else 0.0,
+            }
+
+        full = {
+            "baseline": baseline_name or "unknown",
+            "wcr": wcr,
+            "hir": hir,
+            "rr_task": rr_task,
+            "rr_event": rr_event,
+            "mttr_event": mttr_event,
+            "mttr": mttr_event,
+            "cpt": cpt,
+            "cps": cps,
+            "rco": rco,
+            "uar": uar,
+            "srr": srr,
+            "srr_eligible": srr_eligible_tasks,
+            "srr_pass": srr_pass_tasks,
+            "total_tasks": total_tasks,
+            "completed": completed_tasks,
+            "escalated": escalated_tasks,
+            "tool_calls_total": tool_calls_total,
+            "baseline_calls": self.baseline_calls,
+            "actual_calls": tool_calls_total,
+            "llm_calls": self.llm_calls,
+            "error_tasks": error_tasks,
+            "recovered_tasks": recovered_tasks,
+            "total_error_events": total_error_events,
+            "recovered_error_events": recovered_error_events,
+            # Extra breakdowns (non-scalar; used for deeper comparisons)
+            "final_reason_counts": dict(self.final_reason_counts),
+            "recovery_action_counts": dict(self.recovery_action_counts),
+            "by_first_error_type": by_first_error_type,
+            "by_error_type_event": by_error_type_event,
+        }
+        # Keep a scalar-only view handy for CSV/table exports.
+        full["summary"] = _scalar_summary(full)
+        return full
 
-        first_error = _first_tool_error_event(task_events)
-        if first_error:
-            et = str(first_error.get("error_type") or "Unknown")
-            first_error_type_task_counts[et] += 1
-            first_error_type_outcomes[et][final_outcome] += 1
 
-        total_error_events += len(error_events)
-        for e in error_events:
-            error_type_event_counts[str(e.get("error_type") or "Unknown")] += 1
+# 少于这个行数时进程池的启动与传输开销大于收益，直接顺序计算
+_PARALLEL_MIN_EVENTS = 10_000
 
-        for idx, error_event in enumerate(task_events):
-            if error_event.get("status") != "error":
-                continue
-            recovery_action = _normalize_action(error_event.get("recovery_action"))
-            if recovery_action:
-                recovery_action_counts[recovery_action] += 1
-            if recovery_action not in RECOVERY_ACTIONS:
-                continue
-            if error_event.get("event_type", "tool_call") not in TOOL_EVENT_TYPES:
+
+def _reduce_chunk(data: bytes) -> tuple[list[str], list[dict], IncrementalMetrics, list[dict]] | None:
+    """子进程：解析一段连续的 JSONL 字节并按任务归约
+
+    首、尾两个任务可能跨段（或在别的段里还有事件），原样带回事件由父进程拼接；
+    中间的任务在本进程内累加。返回 (本段任务 id 顺序, 首任务事件, 中间累加, 尾任务事件)。
+    出错返回 None：任务若其实不连续，报错的可能只是残缺的片段，交给顺序路径判定。
+    """
+    try:
+        tasks: dict[str, list[dict]] = defaultdict(list)
+        for event in _parse_jsonl(data):
+            tasks[event["task_id"]].append(event)
+        task_ids = list(tasks)
+        acc = IncrementalMetrics()
+        for task_id in task_ids[1:-1]:
+            acc.add_task(tasks[task_id])
+    except Exception:
+        return None
+    first = tasks[task_ids[0]] if task_ids else []
+    last = tasks[task_ids[-1]] if len(task_ids) > 1 else []
+    return task_ids, first, acc, last
+
+
+def _compute_parallel(data: bytes, parallel: int) -> IncrementalMetrics | None:
+    """按字节切成 parallel 段，在进程池里解析+归约，再按段顺序合并
+
+    解析是主要开销，所以只把原始字节交给子进程（传已解析的事件，pickle 开销比归约本身还大）。
+    任务在轨迹中必须连续（runner 的输出即如此）；若有任务散落在不相邻的段里返回 None，
+    由调用方退回顺序计算；任一段出错也返回 None，由顺序计算给出（或复现）结果。
+    """
+    # 只有这条可选路径用得到进程池，延迟导入免得每个 import metrics 的调用方都加载 multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    bounds = [0]
+    for k in range(1, parallel):
+        start = max(k * len(data) // parallel, bounds[-1])
+        pos = data.find(b"\n", start)
+        bounds.append(len(data) if pos < 0 else pos + 1)
+    bounds.append(len(data))
+    chunks = [data[a:b] for a, b in zip(bounds, bounds[1:]) if b > a]
+
+    acc = IncrementalMetrics()
+    seen: set[str] = set()
+    pending_id, pending_events = None, []
+
+    def flush_pending() -> bool:
+        if pending_id is None:
+            return True
+        if pending_id in seen:
+            return False
+        seen.add(pending_id)
+        try:
+            acc.add_task(pending_events)
+        except Exception:
+            return False
+        return True
+
+    with ProcessPoolExecutor(max_workers=parallel) as pool:
+        for reduced in pool.map(_reduce_chunk, chunks):
+            if reduced is None:
+                return None
+            task_ids, first, chunk_acc, last = reduced
+            if not task_ids:
                 continue
-            error_step = error_event.get("step_idx", 0)
-            error_ts = error_event.get("ts_ms")
-            error_type = str(error_event.get("error_type") or "Unknown")
-            recovered_event = next(
-                (
-                    later_event
-                    for later_event in task_events[idx + 1 :]
-                    if later_event.get("status") == "ok"
-                    and later_event.get("step_idx", 0) == error_step
-                    and later_event.get("event_type", "tool_call") in TOOL_EVENT_TYPES
-                ),
-                None,
-            )
-            if recovered_event:
-                recovered_error_events += 1
-                recovered_error_type_event_counts[error_type] += 1
-                if error_ts is not None and recovered_event.get("ts_ms") is not None:
-                    ok_i = task_events.index(recovered_event)
-                    dt = _mttr_delta_ms(task_events, idx, ok_i)
-                    mttr_event_times.append(dt)
-                    mttr_event_times_by_error_type[error_type].append(dt)
-
-
-        auth_errors = [
-            e
-            for e in error_events
-            if e.get("error_type") in ["AuthDenied", "PolicyRejected"]
-        ]
-        if auth_errors:
-            tasks_with_auth_issues += 1
-
-    wcr = completed_tasks / total_tasks if total_tasks else 0.0
-    rr_task = recovered_tasks / error_tasks if error_tasks else 0.0
-    rr_event = (
-        recovered_error_events / total_error_events if total_error_events else 0.0
-    )
-    mttr_event = sum(mttr_event_times) / len(mttr_event_times) if mttr_event_times else 0.0
-
-    rco = (rco_overhead_calls_total / rco_base_calls_total) if rco_base_calls_total else 0.0
-
-    cpt = tool_calls_total / total_tasks if total_tasks else 0.0
-    cps = tool_calls_total / max(completed_tasks, 1)
-
-    hir = escalated_tasks / total_tasks if total_tasks else 0.0
-    uar = tasks_with_auth_issues / total_tasks if total_tasks else 0.0
-    srr = srr_pass_tasks / srr_eligible_tasks if srr_eligible_tasks else 0.0
-
-    # Build breakdown dicts for inspection / leaderboard details.
-    by_first_error_type = {}
-    for et, count in first_error_type_task_counts.items():
-        outs = first_error_type_outcomes.get(et, Counter())
-        succ = outs.get("success", 0)
-        esc = outs.get("escalated", 0)
-        fail = outs.get("failed", 0)
-        by_first_error_type[et] = {
-            "tasks": int(count),
-            "success": int(succ),
-            "escalated": int(esc),
-            "failed": int(fail),
-            "rr_task": (succ / count) if count else 0.0,
-            "hir": (esc / count) if count else 0.0,
-        }
+            pieces = [(task_ids[0], first)]
+            if len(task_ids) > 1:
+                pieces.append((None, chunk_acc))
+                pieces.append((task_ids[-1], last))
+            for task_id, payload in pieces:
+                if task_id is not None and task_id == pending_id:
+                    pending_events = pending_events + payload  # 跨段任务：按文件顺序拼接
+                    continue
+                if not flush_pending():
+                    return None
+                pending_id, pending_events = None, []
+                if task_id is None:
+                    interior = task_ids[1:-1]
+                    if seen.intersection(interior):
+                        return None
+                    seen.update(interior)
+                    acc.merge(payload)
+                else:
+                    pending_id, pending_events = task_id, payload
+    if not flush_pending():
+        return None
+    return acc
 
-    by_error_type_event = {}
-    for et, cnt in error_type_event_counts.items():
-        rec = recovered_error_type_event_counts.get(et, 0)
-        mttrs = mttr_event_times_by_error_type.get(et, [])
-        by_error_type_event[et] = {
-            "error_events": int(cnt),
-            "recovered_events": int(rec),
-            "rr_event": (rec / cnt) if cnt else 0.0,
-            "mttr_event": (sum(mttrs) / len(mttrs)) if mttrs else 0.0,
-        }
 
-    full = {
-        "baseline": baseline_name or "unknown",
-        "wcr": wcr,
-        "hir": hir,
-        "rr_task": rr_task,
-        "rr_event": rr_event,
-        "mttr_event": mttr_event,
-        "mttr": mttr_event,
-        "cpt": cpt,
-        "cps": cps,
-        "rco": rco,
-        "uar": uar,
-        "srr": srr,
-        "srr_eligible": srr_eligible_tasks,
-        "srr_pass": srr_pass_tasks,
-        "total_tasks": total_tasks,
-        "completed": completed_tasks,
-        "escalated": escalated_tasks,
-        "tool_calls_total": tool_calls_total,
-        "baseline_calls": rco_base_calls_total,
-        "actual_calls": tool_calls_total,
-        "llm_calls": llm_calls,
-        "error_tasks": error_tasks,
-        "recovered_tasks": recovered_tasks,
-        "total_error_events": total_error_events,
-        "recovered_error_events": recovered_error_events,
-        # Extra breakdowns (non-scalar; used for deeper comparisons)
-        "final_reason_counts": dict(final_reason_counts),
-        "recovery_action_counts": dict(recovery_action_counts),
-        "by_first_error_type": by_first_error_type,
-        "by_error_type_event": by_error_type_event,
-    }
-    # Keep a scalar-only view handy for CSV/table exports.
-    full["summary"] = _scalar_summary(full)
-    return full
+def load_prebuilt(path: str, baseline_name: str | None = None) -> dict:
+    """从 IncrementalMetrics 落盘的状态出指标（见 learning_eval --out-metrics）"""
+    with open(path, "r") as f:
+        return IncrementalMetrics.from_dict(json.load(f)).result(baseline_name)
+
+
+def compute_metrics(
+    traces_path: str | list[dict],
+    baseline_name: str | None = None,
+    parallel: int = 1,
+) -> dict:
+    """
+    从轨迹计算所有指标
+
+    指标定义：
+    - WCR: final_outcome == success
+    - HIR: final_outcome == escalated 的任务比例
+    - RR_task: 出现过 error 的任务中，最终成功的比例
+    - RR_event: error 事件后系统能继续推进的比例
+    - MTTR_event: error 到首次同 step ok 的平均时间差
+    - CPT/CPS: 单任务/成功任务平均 tool_calls
+    - RCO: max(actual - baseline, 0) / baseline
+    - UAR: AuthDenied/PolicyRejected 的任务比例
+
+    traces_path 也可以是已经解析好的事件列表（见 load_events）。
+    parallel > 1 且传入的是不少于 _PARALLEL_MIN_EVENTS 行的轨迹文件时，分段交给进程池
+    解析、归约后按顺序合并，结果与顺序计算一致。
+    """
+
+    if isinstance(traces_path, str):
+        with open(traces_path, "rb") as f:
+            data = f.read()
+        if parallel > 1 and data.count(b"\n") >= _PARALLEL_MIN_EVENTS:
+            acc = _compute_parallel(data, parallel)
+            if acc is not None:
+                return acc.result(baseline_name)
+        events = _parse_jsonl(data)
+    else:
+        events = traces_path
+
+    acc = IncrementalMetrics()
+    acc.add_events(events)
+    return acc.result(baseline_name)
 
 
 def print_metrics(metrics: dict, details: bool = False, topk: int = 5):
@@ -330,12 +530,12 @@ def print_metrics(metrics: dict, details: bool = False, topk: int = 5):
     if details:
         reasons = metrics.get("final_reason_counts") or {}
         if reasons:
-            top = sorted(reasons.items(), key=lambda kv: (-kv[1], kv[0]))[:topk]
+            top = heapq.nsmallest(topk, reasons.items(), key=lambda kv: (-kv[1], kv[0]))
             top_str = ", ".join(f"{k}={v}" for k, v in top)
             print(f"Top Escalate Reasons:              {top_str}")
         actions = metrics.get("recovery_action_counts") or {}
         if actions:
-            top = sorted(actions.items(), key=lambda kv: (-kv[1], kv[0]))[:topk]
+            top = heapq.nsmallest(topk, actions.items(), key=lambda kv: (-kv[1], kv[0]))
             top_str = ", ".join(f"{k}={v}" for k, v in top)
             print(f"Top Recovery Actions:              {top_str}")
     print(f"{'='*70}\n")
@@ -343,10 +543,24 @@ def print_metrics(metrics: dict, details: bool = False, topk: int = 5):
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("--traces", required=True)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--traces")
+    source.add_argument(
+        "--prebuilt",
+        help="Metrics state written during the run (learning_eval --out-metrics); skips re-reading traces",
+    )
     parser.add_argument("--baseline", default="unknown")
     parser.add_argument("--details", action="store_true", help="Print extra breakdowns")
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=1,
+        help="Parse/reduce large traces (>= 10k events) in N worker processes",
+    )
     args = parser.parse_args()
-    
-    metrics = compute_metrics(args.traces, args.baseline)
+
+    if args.prebuilt:
+        metrics = load_prebuilt(args.prebuilt, args.baseline)
+    else:
+        metrics = compute_metrics(args.traces, args.baseline, parallel=args.parallel)
     print_metrics(metrics, details=args.details)
@@ -1,11 +1,33 @@
 import hashlib
-import json
 import random
 import time
+from contextlib import contextmanager
+from contextvars import ContextVar
 from state import WorldState, StepResult
 from typing import Optional
 from constants import SEED
 
+# 是否用 time.sleep 模拟工具/故障延迟；非基准测试的快速运行可关闭
+SIMULATE_LATENCY = True
+# simulated_latency() 在当前上下文内覆盖上面的默认值（None 表示不覆盖）；
+# 上下文变量按线程隔离，线程池里的各个 runner 各用各的开关
+_latency_override: ContextVar[Optional[bool]] = ContextVar("simulate_latency", default=None)
+
+
+@contextmanager
+def simulated_latency(enabled: bool):
+    """在 with 块内用 enabled 决定是否 sleep 模拟延迟（BaselineRunner 按实例开关设置）"""
+    token = _latency_override.set(enabled)
+    try:
+        yield
+    finally:
+        _latency_override.reset(token)
+
+
+def _simulating_latency() -> bool:
+    override = _latency_override.get()
+    return SIMULATE_LATENCY if override is None else override
+
 
 # 故障类型常量
 FAULT_TYPES = [
@@ -153,8 +175,8 @@ class FaultInjector:
 
 def _seeded_random(*parts) -> random.Random:
     seed_payload = ":".join(str(p) for p in parts)
-    seed_hash = hashlib.md5(seed_payload.encode()).hexdigest()
-    seed_int = int(seed_hash, 16) % (2**32)
+    # Low 32 bits of the md5 digest (== int(hexdigest, 16) % 2**32, minus the hex round trip)
+    seed_int = int.from_bytes(hashlib.md5(seed_payload.encode()).digest()[-4:], "big")
     return random.Random(seed_int)
 
 
@@ -188,8 +210,9 @@ def _execute_tool(
     if fault_injection:
         fault_type = fault_injection["fault_type"]
         fault_seed = f"{fault_injection.get('task_id', 'unknown')}:{fault_injection.get('fault_id', 'unknown')}"
-        simulated_latency_ms = _fault_latency_ms(fault_type, fault_seed)
-        time.sleep(simulated_latency_ms / 1000.0)
+        if _simulating_latency():
+            simulated_latency_ms = _fault_latency_ms(fault_type, fault_seed)
+            time.sleep(simulated_latency_ms / 1000.0)
         latency_ms = int((time.perf_counter_ns() - start_ns) / 1_000_000)
         
         error_messages = {
@@ -213,12 +236,13 @@ def _execute_tool(
             injected_fault=fault_injection
         )
     
-    # 正常执行
+    # 正常执行（会改状态的工具自行 touch 所改字段；工具失败时不改状态）
     try:
         result = tool_func(world_state, *args, **kwargs)
         # 添加基础执行延迟，避免过于理想
-        base_sleep_ms = _seeded_random(SEED, tool_func.__name__, args, kwargs).randint(5, 40)
-        time.sleep(base_sleep_ms / 1000.0)
+        if _simulating_latency():
+            base_sleep_ms = _seeded_random(SEED, tool_func.__name__, args, kwargs).randint(5, 40)
+            time.sleep(base_sleep_ms / 1000.0)
         latency_ms = int((time.perf_counter_ns() - start_ns) / 1_000_000)
         return StepResult(
             status="ok",
@@ -284,6 +308,7 @@ def update_record(world_state: WorldState, record_id: str, patch: dict, fault_in
             "patch": p,
             "timestamp": int(time.time())
         })
+        ws.touch("records", "audit_log")
         return {"record_id": rid, "updated": True}
     
     return _execute_tool(world_state, _update, fault_injection, record_id, patch)
@@ -296,6 +321,7 @@ def notify_user(world_state: WorldState, record_id: str, fault_injection: Option
             "record_id": rid,
             "timestamp": int(time.time())
         })
+        ws.touch("audit_log")
         return {"record_id": rid, "notified": True}
     return _execute_tool(world_state, _notify, fault_injection, record_id)
 
@@ -308,6 +334,7 @@ def send_message(world_state: WorldState, user_id: str, text: str, fault_injecti
             "text": txt,
             "timestamp": int(time.time())
         })
+        ws.touch("audit_log")
         return {"user_id": uid, "sent": True}
     
     return _execute_tool(world_state, _send, fault_injection, user_id, text)
@@ -323,6 +350,7 @@ def create_ticket(world_state: WorldState, summary: str, severity: str, fault_in
             "severity": sev,
             "timestamp": int(time.time())
         })
+        ws.touch("audit_log")
         return {"ticket_id": ticket_id, "created": True}
     
     return _execute_tool(world_state, _create, fault_injection, summary, severity)
@@ -334,6 +362,7 @@ def commit(world_state: WorldState, fault_injection: Optional[dict] = None) -> S
             "action": "commit",
             "timestamp": int(time.time())
         })
+        ws.touch("audit_log")
         return {"committed": True}
     
     return _execute_tool(world_state, _commit, fault_injection)
@@ -351,6 +380,7 @@ def lock_inventory(world_state: WorldState, item_id: str, qty: int, fault_inject
             "qty": amount,
             "timestamp": int(time.time())
         })
+        ws.touch("inventory", "audit_log")
         return {"item_id": item, "locked": amount}
 
     return _execute_tool(world_state, _lock, fault_injection, item_id, qty)
@@ -365,6 +395,7 @@ def unlock_inventory(world_state: WorldState, item_id: str, qty: int, fault_inje
             "qty": amount,
             "timestamp": int(time.time())
         })
+        ws.touch("inventory", "audit_log")
         return {"item_id": item, "unlocked": amount}
 
     return _execute_tool(world_state, _unlock, fault_injection, item_id, qty)
@@ -381,6 +412,7 @@ def process_payment(world_state: WorldState, order_id: str, amount: int, fault_i
             "amount": amt,
             "timestamp": int(time.time())
         })
+        ws.touch("records", "audit_log")
         return {"order_id": oid, "paid": True}
 
     return _execute_tool(world_state, _process, fault_injection, order_id, amount)
@@ -397,6 +429,7 @@ def refund_payment(world_state: WorldState, order_id: str, amount: int, fault_in
             "amount": amt,
             "timestamp": int(time.time())
         })
+        ws.touch("records", "audit_log")
         return {"order_id": oid, "refunded": True}
 
     return _execute_tool(world_state, _refund, fault_injection, order_id, amount)
@@ -409,19 +442,20 @@ def write_audit(world_state: WorldState, record_id: str, fault_injection: Option
             "record_id": rid,
             "timestamp": int(time.time())
         })
+        ws.touch("audit_log")
         return {"record_id": rid, "written": True}
     return _execute_tool(world_state, _write, fault_injection, record_id)
 
 
 def rollback(world_state: WorldState, checkpoint: WorldState, fault_injection: Optional[dict] = None) -> StepResult:
     def _rollback(ws: WorldState, cp: WorldState):
-        # IMPORTANT: deep copy to avoid sharing references with checkpoint
-        ws.records = json.loads(json.dumps(cp.records))
-        ws.inventory = json.loads(json.dumps(cp.inventory))
-        ws.audit_log = json.loads(json.dumps(cp.audit_log)) + [{
+        # IMPORTANT: restore_from copies, so no references are shared with checkpoint
+        ws.restore_from(cp)
+        ws.audit_log.append({
             "action": "rollback",
             "timestamp": int(time.time())
-        }]
+        })
+        ws.touch("audit_log")
         return {"rolled_back": True}
     
     return _execute_tool(world_state, _rollback, fault_injection, checkpoint)
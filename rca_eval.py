@@ -1,12 +1,24 @@
 import json
 import argparse
-try:
-    import pandas as pd
-except ModuleNotFoundError:  # pragma: no cover
-    pd = None
+import functools
 from collections import defaultdict
 from state import TraceEvent
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+@functools.lru_cache(maxsize=None)
+def _pd():
+    """pandas（可选）在首次需要时才导入；--help 和空结果路径不承担导入开销"""
+    try:
+        import pandas
+    except ModuleNotFoundError:  # pragma: no cover
+        return None
+    return pandas
+
 
 def evaluate_rca(traces_path: str, evaluation_level: str = "event") -> dict:
     """
@@ -23,10 +35,10 @@ def evaluate_rca(traces_path: str, evaluation_level: str = "event") -> dict:
     """
     
     # 加载轨迹
-    events = []
-    with open(traces_path, 'r') as f:
-        for line in f:
-            events.append(json.loads(line))
+    # orjson 直接解析 bytes；没有安装时退回 json.loads（同样接受 bytes）
+    loads = orjson.loads if orjson is not None else json.loads
+    with open(traces_path, 'rb', buffering=1 << 20) as f:
+        events = [loads(line) for line in f]
     
     if not events:
         print("No events found in traces")
@@ -111,6 +123,7 @@ def evaluate_rca(traces_path: str, evaluation_level: str = "event") -> dict:
             row[gt_layer] = count
         confusion_matrix.append(row)
     
+    pd = _pd()
     confusion_df = pd.DataFrame(confusion_matrix) if pd else confusion_matrix
     
     # 统计
@@ -205,7 +218,7 @@ def print_rca_results(results: dict):
         print(f"  {layer:12s}: {count:3d}")
     
     print(f"\nConfusion Matrix (rows=predicted, cols=actual):")
-    if pd is None:
+    if isinstance(results["confusion_matrix"], list):  # pandas unavailable
         headers = ["predicted"] + ["transient", "persistent", "semantic", "cascade"]
         print(" ".join(f"{h:>10s}" for h in headers))
         for row in results["confusion_matrix"]:
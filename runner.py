@@ -3,6 +3,7 @@ from __future__ import annotations
 import argparse
 import json
 import time
+from collections import Counter
 from dataclasses import dataclass
 from typing import Any, Callable, Optional
 
@@ -10,42 +11,105 @@ import mock_api
 from oracle_checker import check_success, check_consistency
 from saga import SagaManager, TransactionStack
 from state import Budget, StepContext, TraceEvent, WorldState
-from trace_logger import TraceLogger
+from trace_logger import TraceLogger, timestamp_ms
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _json_len(obj: Any) -> int:
+    """len(json.dumps(obj)) computed by walking the structure, without building the string."""
+    t = type(obj)
+    if t is str:
+        # Printable ASCII without quotes/backslashes is emitted verbatim.
+        if obj.isascii() and obj.isprintable() and '"' not in obj and "\\" not in obj:
+            return len(obj) + 2
+        return len(json.dumps(obj))
+    if t is dict:
+        n = 4 * len(obj) if obj else 2  # braces + ": " per item + ", " between items
+        for k, v in obj.items():
+            n += _json_len(k if type(k) is str else json.dumps(k)) + _json_len(v)
+        return n
+    if t is list or t is tuple:
+        n = 2 * len(obj) if obj else 2  # brackets plus ", " between items
+        for v in obj:
+            n += _json_len(v)
+        return n
+    if t is int:
+        return len(repr(obj))
+    if obj is None or obj is True:
+        return 4
+    if obj is False:
+        return 5
+    return len(json.dumps(obj))
 
 
 class BudgetTracker:
+    __slots__ = ("budget", "_token_cache")
+
     def __init__(self, budget: Budget):
         self.budget = budget
         self.budget.start_time = time.perf_counter()
+        # id(params) -> (params, tokens)；重试同一步骤时 params 是同一个对象。
+        # 保留 params 引用，防止对象回收后 id 被复用。tracker 按任务创建，缓存随任务释放。
+        self._token_cache: dict[int, tuple[Any, int]] = {}
     
     def estimate_tokens(self, data: dict) -> int:
-        """估算 token 使用"""
-        return len(json.dumps(data)) // 4
+        """估算 token 使用（与 len(json.dumps(data)) // 4 等价，但不序列化）"""
+        hit = self._token_cache.get(id(data))
+        if hit is not None and hit[0] is data:
+            return hit[1]
+        tokens = _json_len(data) // 4
+        self._token_cache[id(data)] = (data, tokens)
+        return tokens
     
-    def check_budget(self) -> dict:
-        """检查预算剩余"""
-        elapsed = time.perf_counter() - self.budget.start_time
+    def check_budget(self, now: float | None = None) -> dict:
+        """检查预算剩余（now: 调用方已采样的 perf_counter，避免同一事件重复取时钟）"""
+        if now is None:
+            now = time.perf_counter()
+        elapsed = now - self.budget.start_time
         return {
             "tokens": self.budget.max_tokens - self.budget.used_tokens,
             "tool_calls": self.budget.max_tool_calls - self.budget.used_tool_calls,
             "time": self.budget.max_time_s - elapsed
         }
 
-    def snapshot(self) -> dict:
-        """返回预算剩余和已用"""
-        elapsed = time.perf_counter() - self.budget.start_time
-        remaining = self.check_budget()
-        used = {
-            "tokens": self.budget.used_tokens,
-            "tool_calls": self.budget.used_tool_calls,
-            "time": elapsed
+    def snapshot(self, now: float | None = None) -> dict:
+        """返回预算剩余和已用（两个 dict 各只构造一次，elapsed 只算一次）
+
+        TraceEvent 按引用保存 remaining，因此每次调用都返回新 dict，不能复用。
+        """
+        if now is None:
+            now = time.perf_counter()
+        budget = self.budget
+        used_tokens = budget.used_tokens
+        used_tool_calls = budget.used_tool_calls
+        elapsed = now - budget.start_time
+        return {
+            "remaining": {
+                "tokens": budget.max_tokens - used_tokens,
+                "tool_calls": budget.max_tool_calls - used_tool_calls,
+                "time": budget.max_time_s - elapsed,
+            },
+            "used": {
+                "tokens": used_tokens,
+                "tool_calls": used_tool_calls,
+                "time": elapsed,
+            },
         }
-        return {"remaining": remaining, "used": used}
     
-    def is_exhausted(self) -> bool:
-        """检查预算是否耗尽"""
-        remaining = self.check_budget()
-        return any(v <= 0 for v in remaining.values())
+    def is_exhausted(self, now: float | None = None) -> bool:
+        """检查预算是否耗尽（直接比较，不构造中间 dict）"""
+        if now is None:
+            now = time.perf_counter()
+        budget = self.budget
+        return (
+            budget.used_tokens >= budget.max_tokens
+            or budget.used_tool_calls >= budget.max_tool_calls
+            or now - budget.start_time >= budget.max_time_s
+        )
     
     def consume(self, tokens: int = 0, tool_calls: int = 0):
         """消耗预算"""
@@ -57,6 +121,8 @@ class WorkflowRunner:
     def __init__(self, use_saga: bool = True):
         self.logger = TraceLogger()
         self.use_saga = use_saga
+        # 工具表只构造一次，步骤循环里直接查表
+        self._tool_spec_map = self._tool_specs()
 
     def run_task(self, task: dict) -> dict:
         """执行单个任务"""
@@ -64,11 +130,7 @@ class WorkflowRunner:
 
         # 初始化状态
         initial_state = task["initial_world_state"]
-        world_state = WorldState(
-            records=initial_state["records"].copy(),
-            inventory=initial_state["inventory"].copy(),
-            audit_log=initial_state["audit_log"].copy()
-        )
+        world_state = WorldState.from_initial(initial_state)
         saga_manager = SagaManager(self.logger, TransactionStack())
         compensation_needed = False
         side_effect_started = False  # 只要成功执行过可补偿工具(lock/payment)，就 True
@@ -97,15 +159,28 @@ class WorkflowRunner:
 
         # 执行步骤
         steps = task["steps"]
-        fault_injections = task.get("fault_injections", [])
-
-        checkpoint = world_state.deep_copy()
+        # 每个 step 只看第一条匹配的故障配置（与原线性扫描 + break 语义一致）
+        fault_by_step = {}
+        for fi in task.get("fault_injections", []):
+            fault_by_step.setdefault(fi["step_idx"], fi)
+
+        # 惰性 checkpoint：None 表示“自上次成功以来状态未变”，真正回滚时才物化快照。
+        # 前提：mock_api 工具失败时不改状态（fail-atomic），故障注入也不改状态。
+        checkpoint: WorldState | None = None
         failure_history = []  # 记录失败历史用于死循环检测
         retry_counts = {}
 
+        # is_exhausted 内联到循环头：预算上限在任务内不变，先绑定为局部变量
+        max_tokens, max_tool_calls = budget.max_tokens, budget.max_tool_calls
+        start_time, max_time_s = budget.start_time, budget.max_time_s
+
         step_idx = 0
         while step_idx < len(steps):
-            if tracker.is_exhausted():
+            if (
+                budget.used_tokens >= max_tokens
+                or budget.used_tool_calls >= max_tool_calls
+                or time.perf_counter() - start_time >= max_time_s
+            ):
                 self._escalate_human(task_id, step_idx, "budget_exhausted", world_state, tracker)
                 return _finalize_and_return("escalated", "budget_exhausted")
 
@@ -116,22 +191,21 @@ class WorkflowRunner:
 
             # 查找故障注入
             fault_injection = None
-            for fi in fault_injections:
-                if fi["step_idx"] == step_idx:
-                    injected = mock_api.FaultInjector.should_inject(
-                        fi, step_idx, task_id, world_state, attempt_idx
-                    )
-                    if injected:
-                        fault_injection = injected
-                    break
+            fi = fault_by_step.get(step_idx)
+            if fi is not None:
+                fault_injection = mock_api.FaultInjector.should_inject(
+                    fi, step_idx, task_id, world_state, attempt_idx
+                )
 
             # 执行工具
-            tool_spec = self._tool_specs().get(tool_name)
+            tool_spec = self._tool_spec_map.get(tool_name)
             result = self._execute_step(world_state, tool_name, tool_spec, params, fault_injection)
 
-            # 记录轨迹
+            # 记录轨迹（每个事件只采样一次时钟）
             state_hash = world_state.compute_hash()
-            budget_snapshot = tracker.snapshot()
+            now = time.perf_counter()
+            budget_snapshot = tracker.snapshot(now)
+            remaining, used = budget_snapshot["remaining"], budget_snapshot["used"]
             event = TraceEvent(
                 task_id=task_id,
                 step_idx=step_idx,
@@ -143,25 +217,25 @@ class WorkflowRunner:
                 error_type=result.error_type,
                 injected_fault=result.injected_fault,
                 state_hash=state_hash,
-                budget=budget_snapshot["remaining"],
+                budget=remaining,
                 recovery_action=None,
-                ts_ms=int(time.time() * 1000),
+                ts_ms=timestamp_ms(now),
                 attempt_idx=attempt_idx,
                 event_type="tool_call",
-                budget_remaining_tokens=budget_snapshot["remaining"]["tokens"],
-                budget_remaining_tool_calls=budget_snapshot["remaining"]["tool_calls"],
-                budget_remaining_time_s=budget_snapshot["remaining"]["time"],
-                budget_used_tokens=budget_snapshot["used"]["tokens"],
-                budget_used_tool_calls=budget_snapshot["used"]["tool_calls"],
-                budget_used_time_s=budget_snapshot["used"]["time"],
+                budget_remaining_tokens=remaining["tokens"],
+                budget_remaining_tool_calls=remaining["tool_calls"],
+                budget_remaining_time_s=remaining["time"],
+                budget_used_tokens=used["tokens"],
+                budget_used_tool_calls=used["tool_calls"],
+                budget_used_time_s=used["time"],
                 compensation_action=None,
                 saga_stack_depth=saga_manager.stack.depth(),
                 diagnosis=None
             )
 
-            # 消耗预算
-            tokens = tracker.estimate_tokens(params)
-            tracker.consume(tokens=tokens, tool_calls=1)
+            # 消耗预算（consume 内联：直接累加到本任务的 budget）
+            budget.used_tokens += tracker.estimate_tokens(params)
+            budget.used_tool_calls += 1
 
             if result.status == "ok":
                 self.logger.append(event)
@@ -171,7 +245,7 @@ class WorkflowRunner:
                     )
                     saga_manager.stack.push(tool_spec.compensate, compensate_args)
                     side_effect_started = True
-                checkpoint = world_state.deep_copy()
+                checkpoint = None
                 failure_history.clear()
                 retry_counts[step_idx] = 0
                 step_idx += 1
@@ -219,8 +293,17 @@ class WorkflowRunner:
                     if saga_manager.stack.depth() > 0:
                         compensation_needed = True
                     # 优先恢复 checkpoint 再执行 saga 补偿，避免补偿被旧快照覆盖
+                    if checkpoint is None:
+                        # 当前状态就是上次成功后的状态：把现有容器直接交给快照，rollback 里只复制一次
+                        checkpoint = WorldState(
+                            records=world_state.records,
+                            inventory=world_state.inventory,
+                            audit_log=world_state.audit_log,
+                        )
                     rollback_result = mock_api.rollback(world_state, checkpoint, fault_injection=None)
-                    rollback_snapshot = tracker.snapshot()
+                    now = time.perf_counter()
+                    rollback_snapshot = tracker.snapshot(now)
+                    remaining, used = rollback_snapshot["remaining"], rollback_snapshot["used"]
                     rollback_event = TraceEvent(
                         task_id=task_id,
                         step_idx=step_idx,
@@ -232,17 +315,17 @@ class WorkflowRunner:
                         error_type=rollback_result.error_type,
                         injected_fault=rollback_result.injected_fault,
                         state_hash=world_state.compute_hash(),
-                        budget=rollback_snapshot["remaining"],
+                        budget=remaining,
                         recovery_action="rollback",
-                        ts_ms=int(time.time() * 1000),
+                        ts_ms=timestamp_ms(now),
                         attempt_idx=0,
                         event_type="recovery",
-                        budget_remaining_tokens=rollback_snapshot["remaining"]["tokens"],
-                        budget_remaining_tool_calls=rollback_snapshot["remaining"]["tool_calls"],
-                        budget_remaining_time_s=rollback_snapshot["remaining"]["time"],
-                        budget_used_tokens=rollback_snapshot["used"]["tokens"],
-                        budget_used_tool_calls=rollback_snapshot["used"]["tool_calls"],
-                        budget_used_time_s=rollback_snapshot["used"]["time"],
+                        budget_remaining_tokens=remaining["tokens"],
+                        budget_remaining_tool_calls=remaining["tool_calls"],
+                        budget_remaining_time_s=remaining["time"],
+                        budget_used_tokens=used["tokens"],
+                        budget_used_tool_calls=used["tool_calls"],
+                        budget_used_time_s=used["time"],
                         compensation_action=None,
                         saga_stack_depth=saga_manager.stack.depth(),
                         diagnosis=None
@@ -305,7 +388,7 @@ class WorkflowRunner:
             raise ValueError(f"Unknown tool: {tool_name}")
         return tool_spec.do(world_state, **params, fault_injection=fault_injection)
 
-    def _recover(self, world_state: WorldState, checkpoint: WorldState, result, step_idx: int, failure_history: list) -> str:
+    def _recover(self, world_state: WorldState, checkpoint: WorldState | None, result, step_idx: int, failure_history: list) -> str:
         """恢复策略"""
         error_type = result.error_type
 
@@ -385,7 +468,9 @@ class WorkflowRunner:
         srr_eligible: bool | None = None,
         srr_pass: bool | None = None
     ):
-        budget_snapshot = tracker.snapshot()
+        now = time.perf_counter()
+        budget_snapshot = tracker.snapshot(now)
+        remaining, used = budget_snapshot["remaining"], budget_snapshot["used"]
         final_event = TraceEvent(
             task_id=task_id,
             step_idx=step_idx,
@@ -397,17 +482,17 @@ class WorkflowRunner:
             error_type=None,
             injected_fault=None,
             state_hash="",
-            budget=budget_snapshot["remaining"],
+            budget=remaining,
             recovery_action=None,
-            ts_ms=int(time.time() * 1000),
+            ts_ms=timestamp_ms(now),
             attempt_idx=0,
             event_type="final",
-            budget_remaining_tokens=budget_snapshot["remaining"]["tokens"],
-            budget_remaining_tool_calls=budget_snapshot["remaining"]["tool_calls"],
-            budget_remaining_time_s=budget_snapshot["remaining"]["time"],
-            budget_used_tokens=budget_snapshot["used"]["tokens"],
-            budget_used_tool_calls=budget_snapshot["used"]["tool_calls"],
-            budget_used_time_s=budget_snapshot["used"]["time"],
+            budget_remaining_tokens=remaining["tokens"],
+            budget_remaining_tool_calls=remaining["tool_calls"],
+            budget_remaining_time_s=remaining["time"],
+            budget_used_tokens=used["tokens"],
+            budget_used_tool_calls=used["tool_calls"],
+            budget_used_time_s=used["time"],
             final_outcome=final_outcome,
             final_reason=reason,
             compensation_action=None,
@@ -438,10 +523,10 @@ def main():
     args = parser.parse_args()
     
     # 加载任务
-    tasks = []
-    with open(args.tasks, 'r') as f:
-        for line in f:
-            tasks.append(json.loads(line))
+    # orjson 直接解析 bytes；没有安装时退回 json.loads（同样接受 bytes）
+    loads = orjson.loads if orjson is not None else json.loads
+    with open(args.tasks, 'rb', buffering=1 << 20) as f:
+        tasks = [loads(line) for line in f]
     
     print(f"Loaded {len(tasks)} tasks from {args.tasks}")
     
@@ -458,8 +543,9 @@ def main():
     runner.logger.flush_jsonl(args.out)
     
     # 统计
-    success_count = sum(1 for r in results if r["status"] == "success")
-    escalated_count = sum(1 for r in results if r["status"] == "escalated")
+    status_counts = Counter(r["status"] for r in results)
+    success_count = status_counts["success"]
+    escalated_count = status_counts["escalated"]
     
     print(f"\n=== Summary ===")
     print(f"Success: {success_count}/{len(tasks)}")
@@ -2,6 +2,7 @@ from dataclasses import dataclass, field
 from typing import Callable, Any
 import time
 from state import TraceEvent, WorldState
+from trace_logger import timestamp_ms
 import mock_api
 
 
@@ -67,7 +68,9 @@ class SagaManager:
             result = action.compensate_fn(
                 world_state, *action.args, **action.kwargs, fault_injection=None
             )
-            budget_snapshot = tracker.snapshot()
+            now = time.perf_counter()
+            budget_snapshot = tracker.snapshot(now)
+            remaining, used = budget_snapshot["remaining"], budget_snapshot["used"]
             event = TraceEvent(
                 task_id=task_id,
                 step_idx=step_idx,
@@ -79,17 +82,17 @@ class SagaManager:
                 error_type=result.error_type,
                 injected_fault=result.injected_fault,
                 state_hash=world_state.compute_hash(),
-                budget=budget_snapshot["remaining"],
+                budget=remaining,
                 recovery_action="rollback",
-                ts_ms=int(time.time() * 1000),
+                ts_ms=timestamp_ms(now),
                 attempt_idx=0,
                 event_type="compensation",
-                budget_remaining_tokens=budget_snapshot["remaining"]["tokens"],
-                budget_remaining_tool_calls=budget_snapshot["remaining"]["tool_calls"],
-                budget_remaining_time_s=budget_snapshot["remaining"]["time"],
-                budget_used_tokens=budget_snapshot["used"]["tokens"],
-                budget_used_tool_calls=budget_snapshot["used"]["tool_calls"],
-                budget_used_time_s=budget_snapshot["used"]["time"],
+                budget_remaining_tokens=remaining["tokens"],
+                budget_remaining_tool_calls=remaining["tool_calls"],
+                budget_remaining_time_s=remaining["time"],
+                budget_used_tokens=used["tokens"],
+                budget_used_tool_calls=used["tool_calls"],
+                budget_used_time_s=used["time"],
                 compensation_action="saga_rollback",
                 saga_stack_depth=self.stack.depth(),
                 diagnosis=None
@@ -116,7 +119,9 @@ class SagaManager:
             severity="critical",
             fault_injection=None,
         )
-        budget_snapshot = tracker.snapshot()
+        now = time.perf_counter()
+        budget_snapshot = tracker.snapshot(now)
+        remaining, used = budget_snapshot["remaining"], budget_snapshot["used"]
         event = TraceEvent(
             task_id=task_id,
             step_idx=step_idx,
@@ -128,17 +133,17 @@ class SagaManager:
             error_type=ticket_result.error_type,
             injected_fault=ticket_result.injected_fault,
             state_hash=world_state.compute_hash(),
-            budget=budget_snapshot["remaining"],
+            budget=remaining,
             recovery_action="escalate",
-            ts_ms=int(time.time() * 1000),
+            ts_ms=timestamp_ms(now),
             attempt_idx=0,
             event_type="compensation",
-            budget_remaining_tokens=budget_snapshot["remaining"]["tokens"],
-            budget_remaining_tool_calls=budget_snapshot["remaining"]["tool_calls"],
-            budget_remaining_time_s=budget_snapshot["remaining"]["time"],
-            budget_used_tokens=budget_snapshot["used"]["tokens"],
-            budget_used_tool_calls=budget_snapshot["used"]["tool_calls"],
-            budget_used_time_s=budget_snapshot["used"]["time"],
+            budget_remaining_tokens=remaining["tokens"],
+            budget_remaining_tool_calls=remaining["tool_calls"],
+            budget_remaining_time_s=remaining["time"],
+            budget_used_tokens=used["tokens"],
+            budget_used_tool_calls=used["tool_calls"],
+            budget_used_time_s=used["time"],
             compensation_action="create_ticket",
             saga_stack_depth=self.stack.depth(),
             diagnosis=None
@@ -4,6 +4,29 @@ import hashlib
 import json
 
 
+def _fast_clone(obj: Any) -> Any:
+    """Deep-copy JSON-shaped data (dict/list nests of immutables) without a JSON round-trip."""
+    t = type(obj)
+    if t is dict:
+        return {k: _fast_clone(v) for k, v in obj.items()}
+    if t is list:
+        return [_fast_clone(v) for v in obj]
+    return obj
+
+
+def _clone_audit_log(audit_log: list) -> list:
+    """Copy an audit log for a new state/snapshot, sharing the entry dicts.
+
+    Entries are only ever appended, never edited in place, so every snapshot can
+    reference the same entry objects; only the list itself has to be private.
+    """
+    return list(audit_log)
+
+
+_HASHED_FIELDS = frozenset(("records", "inventory", "audit_log"))
+_HASHED_FIELDS_SORTED = tuple(sorted(_HASHED_FIELDS))
+
+
 @dataclass
 class WorldState:
     records: dict
@@ -12,6 +35,29 @@ class WorldState:
     fault_log: set[str] = field(default_factory=set)
     fault_plan: dict[str, bool] = field(default_factory=dict)
     fault_state: dict = field(default_factory=dict)  # extra per-fault state (e.g., conflict needs rollback)
+    # Cached compute_hash() result plus the canonical JSON of each hashed field.
+    # Reassigning a hashed field invalidates it; in-place mutations must call
+    # touch(<field>, ...) (every mutating mock_api tool does).
+    _hash_cache: str | None = field(default=None, init=False, repr=False, compare=False)
+    _field_json: dict = field(default_factory=dict, init=False, repr=False, compare=False)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        object.__setattr__(self, name, value)
+        if name in _HASHED_FIELDS:
+            object.__setattr__(self, "_hash_cache", None)
+            # _field_json does not exist yet while __init__ assigns the fields
+            field_json = self.__dict__.get("_field_json")
+            if field_json:
+                field_json.pop(name, None)
+
+    def touch(self, *fields: str) -> None:
+        """Mark hashed fields (default: all of records/inventory/audit_log) as modified in place."""
+        self._hash_cache = None
+        if fields:
+            for name in fields:
+                self._field_json.pop(name, None)
+        else:
+            self._field_json.clear()
 
     def to_dict(self) -> dict:
         return {
@@ -21,17 +67,47 @@ class WorldState:
         }
 
     def compute_hash(self) -> str:
-        data = json.dumps(self.to_dict(), sort_keys=True)
-        return hashlib.sha256(data.encode()).hexdigest()
+        cached = self._hash_cache
+        if cached is None:
+            # Byte-identical to json.dumps(self.to_dict(), sort_keys=True), but only
+            # the fields touched since the last call are re-encoded.
+            field_json = self._field_json
+            for name in _HASHED_FIELDS_SORTED:
+                if name not in field_json:
+                    field_json[name] = json.dumps(getattr(self, name), sort_keys=True)
+            data = '{"audit_log": %s, "inventory": %s, "records": %s}' % (
+                field_json["audit_log"], field_json["inventory"], field_json["records"]
+            )
+            cached = self._hash_cache = hashlib.sha256(data.encode()).hexdigest()
+        return cached
+
+    def restore_from(self, checkpoint: 'WorldState') -> None:
+        """Reset records/inventory/audit_log to private copies of a checkpoint's.
+
+        Fault bookkeeping (fault_log/fault_plan/fault_state) is left as is, like a
+        real rollback that cannot undo what the environment has already seen.
+        """
+        self.records = _fast_clone(checkpoint.records)
+        self.inventory = _fast_clone(checkpoint.inventory)
+        self.audit_log = _clone_audit_log(checkpoint.audit_log)
+
+    @classmethod
+    def from_initial(cls, initial_state: dict) -> 'WorldState':
+        """Build a fresh state from a task's initial_world_state, without aliasing its containers."""
+        return cls(
+            records=_fast_clone(initial_state["records"]),
+            inventory=_fast_clone(initial_state["inventory"]),
+            audit_log=_clone_audit_log(initial_state["audit_log"]),
+        )
 
     def deep_copy(self) -> 'WorldState':
         return WorldState(
-            records=json.loads(json.dumps(self.records)),
-            inventory=json.loads(json.dumps(self.inventory)),
-            audit_log=json.loads(json.dumps(self.audit_log)),
+            records=_fast_clone(self.records),
+            inventory=_fast_clone(self.inventory),
+            audit_log=_clone_audit_log(self.audit_log),
             fault_log=set(self.fault_log),
             fault_plan=dict(self.fault_plan),
-            fault_state=json.loads(json.dumps(self.fault_state))
+            fault_state=_fast_clone(self.fault_state)
         )
 
 
@@ -67,7 +143,7 @@ class StepResult:
     injected_fault: dict | None
 
 
-@dataclass
+@dataclass(slots=True)
 class TraceEvent:
     task_id: str
     step_idx: int
@@ -99,6 +175,8 @@ class TraceEvent:
     srr_pass: bool | None = None
 
     def to_dict(self) -> dict:
+        # Shallow on purpose (unlike dataclasses.asdict): nested params/budget/diagnosis
+        # dicts are shared with the event, not deep-copied.
         return {
             "task_id": self.task_id,
             "step_idx": self.step_idx,
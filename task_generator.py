@@ -120,8 +120,7 @@ def _get_fault_templates(profile: str) -> list[dict]:
 def _instantiate_steps(template: dict, rec: str, qty: int, amt: int) -> list[dict]:
     steps = []
     for idx, (name, params) in enumerate(template["steps"]):
-        # Replace placeholders
-        p = json.loads(json.dumps(params))
+        # Replace placeholders (rebuilds every dict/list, so template params are never shared)
         def _replace(obj):
             if isinstance(obj, str):
                 if obj == "{rec}":
@@ -137,7 +136,7 @@ def _instantiate_steps(template: dict, rec: str, qty: int, amt: int) -> list[dic
             if isinstance(obj, list):
                 return [_replace(v) for v in obj]
             return obj
-        p = _replace(p)
+        p = _replace(params)
         steps.append({
             "step_idx": idx,
             "step_name": name,
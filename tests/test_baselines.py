@@ -0,0 +1,98 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import baselines
+import mock_api
+from metrics import load_events
+from state import WorldState
+from task_generator import generate_tasks
+
+
+class BaselineLatencyTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.tasks = generate_tasks(n=8, seed=3, fault_profile="balanced")
+        self.tasks_path = os.path.join(self._tmp.name, "tasks.jsonl")
+        with open(self.tasks_path, "w") as f:
+            for task in self.tasks:
+                f.write(json.dumps(task) + "\n")
+
+    def test_runner_flag_disables_mock_api_sleeps(self):
+        runner = baselines.BaselineRunner(mode="B1", simulate_latency=False)
+        with mock.patch.object(mock_api, "SIMULATE_LATENCY", True), \
+                mock.patch.object(mock_api.time, "sleep") as sleep:
+            for task in self.tasks:
+                runner.run_task(task)
+        sleep.assert_not_called()
+
+    def test_run_leaves_module_default_untouched(self):
+        out_path = os.path.join(self._tmp.name, "traces_B1.jsonl")
+        with contextlib.redirect_stdout(io.StringIO()):
+            baselines.run(self.tasks_path, "B1", out_path=out_path, simulate_latency=False)
+        self.assertTrue(mock_api.SIMULATE_LATENCY)
+
+    def test_default_applies_outside_runner(self):
+        world_state = WorldState(records={}, inventory={}, audit_log=[])
+        with mock.patch.object(mock_api.time, "sleep") as sleep:
+            mock_api.commit(world_state)
+            with mock_api.simulated_latency(False):
+                mock_api.commit(world_state)
+        self.assertEqual(sleep.call_count, 1)
+
+
+# Wall-clock fields differ between any two runs.
+_TIMING_FIELDS = {"ts_ms", "latency_ms", "budget_remaining_time_s", "budget_used_time_s"}
+
+
+def _without_timing(events: list[dict]) -> list[dict]:
+    stripped = []
+    for event in events:
+        event = {k: v for k, v in event.items() if k not in _TIMING_FIELDS}
+        if isinstance(event.get("budget"), dict):
+            event["budget"] = {k: v for k, v in event["budget"].items() if k != "time"}
+        stripped.append(event)
+    return stripped
+
+
+class ParallelRunTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self._tmp.cleanup)
+        self.tasks_path = os.path.join(self._tmp.name, "tasks.jsonl")
+        with open(self.tasks_path, "w") as f:
+            for task in generate_tasks(n=20, seed=5, fault_profile="balanced"):
+                f.write(json.dumps(task) + "\n")
+
+    def _run(self, mode: str, parallel: int, **kwargs) -> tuple[list[dict], str]:
+        out_path = os.path.join(self._tmp.name, f"traces_{mode}_{parallel}.jsonl")
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout):
+            baselines.run(
+                self.tasks_path, mode, out_path=out_path, simulate_latency=False,
+                parallel=parallel, executor="thread", **kwargs,
+            )
+        return _without_timing(load_events(out_path)), stdout.getvalue()
+
+    def test_parallel_traces_match_sequential(self):
+        for mode in ("B0", "B1", "B2", "B3"):
+            with self.subTest(mode=mode):
+                expected, _ = self._run(mode, 1)
+                actual, _ = self._run(mode, 2)
+                self.assertEqual(actual, expected)
+
+    def test_b4_falls_back_to_sequential(self):
+        memory_path = os.path.join(self._tmp.name, "memory_bank.json")
+        with mock.patch.object(baselines, "ThreadPoolExecutor") as pool_cls:
+            _, stdout = self._run("B4", 2, memory_path=memory_path)
+        pool_cls.assert_not_called()
+        self.assertIn("ignoring --parallel", stdout)
+
+
+if __name__ == "__main__":
+    unittest.main()
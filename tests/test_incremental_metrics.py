@@ -0,0 +1,67 @@
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import baselines
+import metrics
+from metrics import IncrementalMetrics
+from task_generator import generate_tasks
+
+
+class IncrementalMetricsTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmp = tempfile.TemporaryDirectory()
+        tasks_path = os.path.join(cls._tmp.name, "tasks.jsonl")
+        with open(tasks_path, "w") as f:
+            for task in generate_tasks(n=30, seed=11, fault_profile="balanced"):
+                f.write(json.dumps(task) + "\n")
+        cls.traces_path = os.path.join(cls._tmp.name, "traces_B2.jsonl")
+        with contextlib.redirect_stdout(io.StringIO()):
+            baselines.run(tasks_path, "B2", out_path=cls.traces_path, simulate_latency=False)
+        cls.events = metrics.load_events(cls.traces_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._tmp.cleanup()
+
+    def assertSameMetrics(self, actual, expected):
+        self.assertEqual(actual, expected)
+        # Counter-derived breakdowns must also keep the same key order.
+        self.assertEqual(json.dumps(actual), json.dumps(expected))
+
+    def test_prebuilt_state_matches_compute_metrics(self):
+        acc = IncrementalMetrics()
+        acc.add_events(self.events)
+        state_path = os.path.join(self._tmp.name, "metrics_state.json")
+        with open(state_path, "w") as f:
+            json.dump(acc.to_dict(), f)
+
+        expected = metrics.compute_metrics(self.traces_path, "B2")
+        self.assertTrue(expected["by_error_type_event"])
+        self.assertSameMetrics(metrics.load_prebuilt(state_path, "B2"), expected)
+
+    def test_merge_of_halves_matches_single_pass(self):
+        task_ids = list(dict.fromkeys(e["task_id"] for e in self.events))
+        head = set(task_ids[: len(task_ids) // 2])
+
+        single = IncrementalMetrics()
+        single.add_events(self.events)
+        first = IncrementalMetrics()
+        first.add_events([e for e in self.events if e["task_id"] in head])
+        second = IncrementalMetrics()
+        second.add_events([e for e in self.events if e["task_id"] not in head])
+        first.merge(second)
+
+        self.assertEqual(first.to_dict(), single.to_dict())
+        self.assertSameMetrics(first.result("B2"), single.result("B2"))
+
+    def test_empty_state_yields_no_metrics(self):
+        self.assertEqual(IncrementalMetrics.from_dict(IncrementalMetrics().to_dict()).result(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+import baselines
+import metrics
+from task_generator import generate_tasks
+
+
+class ParallelMetricsTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmp = tempfile.TemporaryDirectory()
+        tasks_path = os.path.join(cls._tmp.name, "tasks.jsonl")
+        with open(tasks_path, "w") as f:
+            for task in generate_tasks(n=30, seed=7, fault_profile="balanced"):
+                f.write(json.dumps(task) + "\n")
+        traces_path = os.path.join(cls._tmp.name, "traces_B3.jsonl")
+        with contextlib.redirect_stdout(io.StringIO()):
+            baselines.run(tasks_path, "B3", out_path=traces_path, simulate_latency=False)
+        with open(traces_path, "rb") as f:
+            cls.lines = f.read().splitlines(keepends=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._tmp.cleanup()
+
+    def _write(self, name, lines):
+        path = os.path.join(self._tmp.name, name)
+        with open(path, "wb") as f:
+            f.writelines(lines)
+        return path
+
+    def assertParallelMatchesSequential(self, path):
+        expected = metrics.compute_metrics(path, "B3")
+        self.assertTrue(expected)
+        # Patch the threshold down so the small trace actually goes through the process pool.
+        with mock.patch.object(metrics, "_PARALLEL_MIN_EVENTS", 1):
+            for parallel in (2, 3, 4):
+                with self.subTest(parallel=parallel):
+                    self.assertEqual(metrics.compute_metrics(path, "B3", parallel=parallel), expected)
+
+    def test_contiguous_trace(self):
+        path = self._write("contiguous.jsonl", self.lines)
+        with mock.patch.object(metrics, "_PARALLEL_MIN_EVENTS", 1):
+            self.assertIsNotNone(metrics._compute_parallel(b"".join(self.lines), 3))
+        self.assertParallelMatchesSequential(path)
+
+    def test_interleaved_trace(self):
+        lines = list(self.lines)
+        random.Random(0).shuffle(lines)
+        path = self._write("shuffled.jsonl", lines)
+        self.assertParallelMatchesSequential(path)
+
+    def test_duplicate_task_ids(self):
+        # The same task ids appear again in a later, non-adjacent block of the file.
+        path = self._write("duplicated.jsonl", self.lines + self.lines)
+        self.assertIsNone(metrics._compute_parallel(b"".join(self.lines * 2), 2))
+        self.assertParallelMatchesSequential(path)
+
+    def test_small_trace_stays_sequential(self):
+        path = self._write("small.jsonl", self.lines)
+        with mock.patch.object(metrics, "_compute_parallel") as compute_parallel:
+            result = metrics.compute_metrics(path, "B3", parallel=4)
+        compute_parallel.assert_not_called()
+        self.assertEqual(result, metrics.compute_metrics(path, "B3"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import hashlib
+import json
+import unittest
+
+import mock_api
+from state import WorldState
+
+
+def _reference_hash(world_state: WorldState) -> str:
+    data = json.dumps(world_state.to_dict(), sort_keys=True)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+class WorldStateHashTests(unittest.TestCase):
+    def setUp(self):
+        self._latency = mock_api.SIMULATE_LATENCY
+        mock_api.SIMULATE_LATENCY = False
+        self.world_state = WorldState(
+            records={
+                "R-001": {"status": "pending", "owner": "U-001"},
+                "O-001": {"status": "new"},
+            },
+            inventory={"SKU-1": 5},
+            audit_log=[],
+        )
+
+    def tearDown(self):
+        mock_api.SIMULATE_LATENCY = self._latency
+
+    def assertHashInSync(self, label):
+        self.assertEqual(self.world_state.compute_hash(), _reference_hash(self.world_state), label)
+
+    def test_mutating_tools_keep_hash_in_sync(self):
+        ws = self.world_state
+        checkpoint = ws.deep_copy()
+        calls = [
+            ("update_record", lambda: mock_api.update_record(ws, "R-001", {"status": "done"})),
+            ("notify_user", lambda: mock_api.notify_user(ws, "R-001")),
+            ("send_message", lambda: mock_api.send_message(ws, "U-001", "hello")),
+            ("create_ticket", lambda: mock_api.create_ticket(ws, "broken", "high")),
+            ("commit", lambda: mock_api.commit(ws)),
+            ("lock_inventory", lambda: mock_api.lock_inventory(ws, "SKU-1", 2)),
+            ("unlock_inventory", lambda: mock_api.unlock_inventory(ws, "SKU-1", 1)),
+            ("unlock_inventory (new item)", lambda: mock_api.unlock_inventory(ws, "SKU-2", 3)),
+            ("process_payment", lambda: mock_api.process_payment(ws, "O-001", 100)),
+            ("refund_payment", lambda: mock_api.refund_payment(ws, "O-001", 100)),
+            ("write_audit", lambda: mock_api.write_audit(ws, "R-001")),
+            ("rollback", lambda: mock_api.rollback(ws, checkpoint)),
+        ]
+        for label, call in calls:
+            # Warm the cache first so a tool that forgets touch() leaves a stale hash behind.
+            before = ws.compute_hash()
+            result = call()
+            self.assertEqual(result.status, "ok", label)
+            self.assertHashInSync(label)
+            self.assertNotEqual(ws.compute_hash(), before, label)
+
+    def test_failed_tool_leaves_hash_unchanged(self):
+        ws = self.world_state
+        before = ws.compute_hash()
+        result = mock_api.lock_inventory(ws, "SKU-1", 99)
+        self.assertEqual(result.status, "error")
+        self.assertEqual(ws.compute_hash(), before)
+        self.assertHashInSync("lock_inventory (insufficient)")
+
+    def test_field_reassignment_invalidates_hash(self):
+        ws = self.world_state
+        ws.compute_hash()
+        ws.inventory = {"SKU-1": 0}
+        self.assertHashInSync("inventory reassigned")
+        ws.compute_hash()
+        ws.restore_from(ws.deep_copy())
+        self.assertHashInSync("restore_from")
+
+
+if __name__ == "__main__":
+    unittest.main()
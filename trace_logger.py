@@ -1,17 +1,59 @@
 import json
+import time
 from typing import List
 from state import TraceEvent
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+if orjson is not None:
+    _ORJSON_OPTS = orjson.OPT_NON_STR_KEYS
+
+    def _dumps_line(obj) -> bytes:
+        return orjson.dumps(obj, option=_ORJSON_OPTS)
+else:
+    _encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+    def _dumps_line(obj) -> bytes:
+        return _encode(obj).encode()
+
+
+# Event timestamps are wall-clock ms derived from the monotonic perf_counter: they
+# never go backwards (trace ordering sorts on ts_ms) and can reuse the clock sample
+# the runners already take for budget accounting.
+_WALL_ANCHOR_S = time.time()
+_PERF_ANCHOR_S = time.perf_counter()
+
+
+def timestamp_ms(now: float | None = None) -> int:
+    """Wall-clock milliseconds for a perf_counter() reading (default: read it now)."""
+    if now is None:
+        now = time.perf_counter()
+    return int((_WALL_ANCHOR_S + (now - _PERF_ANCHOR_S)) * 1000)
+
 
 class TraceLogger:
+    # Events serialized per write() on flush; bounds the size of the joined buffer.
+    FLUSH_BATCH_SIZE = 1024
+
     def __init__(self):
         self.events: List[TraceEvent] = []
-    
+
     def append(self, event: TraceEvent):
+        # Keep append O(1): events stay as objects until flush serializes them.
         self.events.append(event)
-    
+
     def flush_jsonl(self, path: str = "traces.jsonl"):
-        with open(path, 'w') as f:
-            for event in self.events:
-                f.write(json.dumps(event.to_dict()) + '\n')
+        # orjson (if installed) returns bytes directly; one write per batch of events.
+        events = self.events
+        batch_size = self.FLUSH_BATCH_SIZE
+        with open(path, 'wb') as f:
+            for start in range(0, len(events), batch_size):
+                f.write(b"".join(
+                    _dumps_line(event.to_dict()) + b"\n"
+                    for event in events[start:start + batch_size]
+                ))
         print(f"Flushed {len(self.events)} events to {path}")